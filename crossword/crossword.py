@@ -1,3 +1,6 @@
+from vocabulary import Vocabulary
+
+
 class Variable():
 
     ACROSS = "across"
@@ -16,11 +19,14 @@ class Variable():
                  self.j + (k if self.direction == Variable.ACROSS else 0))
             )
 
+        # Variables are hashed on every domain lookup, so hash only once
+        self._hash = hash((self.i, self.j, self.direction, self.length))
+
     def __hash__(self):
-        return hash((self.i, self.j, self.direction, self.length))
+        return self._hash
 
     def __eq__(self, other):
-        return (
+        return self is other or (
             (self.i == other.i) and
             (self.j == other.j) and
             (self.direction == other.direction) and
@@ -57,9 +63,9 @@ class Crossword():
                         row.append(False)
                 self.structure.append(row)
 
-        # Save vocabulary list
-        with open(words_file) as f:
-            self.words = set(f.read().upper().splitlines())
+        # Save vocabulary list, with its letter index
+        self.vocabulary = Vocabulary.load(words_file)
+        self.words = set(self.vocabulary)
 
         # Determine variable set
         self.variables = set()
@@ -104,30 +110,56 @@ class Crossword():
                             length=length
                         ))
 
+        # Number the variables, so per-variable data can live in lists
+        self.ordered_variables = sorted(
+            self.variables, key=lambda var: (var.i, var.j, var.direction)
+        )
+        self.variable_ids = {
+            var: index for index, var in enumerate(self.ordered_variables)
+        }
+
         # Compute overlaps for each word
         # For any pair of variables v1, v2, their overlap is either:
         #    None, if the two variables do not overlap; or
         #    (i, j), where v1's ith character overlaps v2's jth character
-        self.overlaps = dict()
-        for v1 in self.variables:
-            for v2 in self.variables:
-                if v1 == v2:
-                    continue
-                cells1 = v1.cells
-                cells2 = v2.cells
-                intersection = set(cells1).intersection(cells2)
-                if not intersection:
-                    self.overlaps[v1, v2] = None
-                else:
-                    intersection = intersection.pop()
-                    self.overlaps[v1, v2] = (
-                        cells1.index(intersection),
-                        cells2.index(intersection)
-                    )
+        # Only overlapping pairs are stored, found from the cells they
+        # share: a cell is part of at most one across and one down word
+        words_at = dict()
+        for var in self.ordered_variables:
+            for k, cell in enumerate(var.cells):
+                words_at.setdefault(cell, []).append((var, k))
+
+        self.overlaps = Overlaps()
+        for crossing in words_at.values():
+            if len(crossing) == 2:
+                (v1, k1), (v2, k2) = crossing
+                self.overlaps[v1, v2] = (k1, k2)
+                self.overlaps[v2, v1] = (k2, k1)
+
+        # adjacency[id] lists (neighbor id, i, j) for every variable the
+        # variable with that id overlaps, at its ith and their jth letter
+        self.adjacency = [[] for _ in self.ordered_variables]
+        self.neighbor_sets = {var: set() for var in self.ordered_variables}
+        for (v1, v2), (i, j) in self.overlaps.items():
+            self.adjacency[self.variable_ids[v1]].append(
+                (self.variable_ids[v2], i, j)
+            )
+            self.neighbor_sets[v1].add(v2)
+        self.neighbor_sets = {
+            var: frozenset(neighbors)
+            for var, neighbors in self.neighbor_sets.items()
+        }
 
     def neighbors(self, var):
         """Given a variable, return set of overlapping variables."""
-        return set(
-            v for v in self.variables
-            if v != var and self.overlaps[v, var]
-        )
+        return self.neighbor_sets[var]
+
+
+class Overlaps(dict):
+    """
+    Overlaps of the pairs of variables that share a cell. Looking up any
+    other pair gives None, as if every pair were stored.
+    """
+
+    def __missing__(self, key):
+        return None
@@ -1,6 +1,7 @@
 import sys
 
-from copy import deepcopy
+from collections import Counter, deque
+
 from crossword import *
 
 class CrosswordCreator():
@@ -8,13 +9,25 @@ class CrosswordCreator():
     def __init__(self, crossword):
         """
         Create new CSP crossword generate.
+
+        Every domain is a bitset of words of its variable's length, as
+        numbered by the crossword's vocabulary (see `Vocabulary`).
         """
         self.crossword = crossword
+        self.vocabulary = self.crossword.vocabulary
         self.domains = {
-            var: self.crossword.words.copy()
+            var: self.vocabulary.full(var.length)
             for var in self.crossword.variables
         }
 
+        # (variable, previous domain) for every domain change, so a
+        # search branch is undone by popping back to a mark
+        self.trail = []
+
+        # How many times each word is placed in the search's assignment,
+        # kept up to date by `assign` and `unassign`
+        self.used = Counter()
+
     def letter_grid(self, assignment):
         """
         Return 2D array representing a given assignment.
@@ -91,6 +104,7 @@ class CrosswordCreator():
         """
         self.enforce_node_consistency()
         self.ac3()
+        self.used.clear()
         return self.backtrack(dict())
 
     def enforce_node_consistency(self):
@@ -98,12 +112,14 @@ class CrosswordCreator():
         Update `self.domains` such that each variable is node-consistent.
         (Remove any values that are inconsistent with a variable's unary
          constraints; in this case, the length of the word.)
+
+        Domains only hold words of their variable's length to begin with,
+        so this just clears any bits beyond the words of that length.
         """
         for variable, words in self.domains.items():
-            length = variable.length
-            for word in words.copy():
-                if not len(word) == length:
-                    self.domains[variable].remove(word)
+            self.domains[variable] = words & self.vocabulary.full(
+                variable.length
+            )
 
     def revise(self, x, y):
         """
@@ -113,26 +129,34 @@ class CrosswordCreator():
 
         Return True if a revision was made to the domain of `x`; return
         False if no revision was made.
+
+        The words of `x` with support are looked up in the vocabulary
+        index: the union of the words of `x` with each letter that the
+        words of `y` still have at the overlap.
         """
-        revised, overlaps = False, self.crossword.overlaps[x, y]
+        overlaps = self.crossword.overlaps[x, y]
+        if overlaps is None:
+            return False
 
-        if overlaps == None:
+        supported = self.vocabulary.supported(
+            x.length, overlaps[0], y.length, overlaps[1], self.domains[y]
+        )
+        revised = self.domains[x] & supported
+        if revised == self.domains[x]:
             return False
-            
-        for x_word in self.domains[x].copy():
-            consistent = False
-            x_char = x_word[overlaps[0]]
-            for y_word in self.domains[y]:
-                y_char = y_word[overlaps[1]]
-                if x_char == y_char:
-                    consistent = True
-                    break
-            # No word in y's domain works with x_word
-            if not consistent:
-                revised = True
-                self.domains[x].remove(x_word)
-
-        return revised
+        self.set_domain(x, revised)
+        return True
+
+    def set_domain(self, var, domain):
+        """Replace the domain of `var`, recording the old one on the trail."""
+        self.trail.append((var, self.domains[var]))
+        self.domains[var] = domain
+
+    def undo(self, mark):
+        """Restore every domain changed since the trail had `mark` entries."""
+        while len(self.trail) > mark:
+            var, domain = self.trail.pop()
+            self.domains[var] = domain
 
     def ac3(self, arcs=None):
         """
@@ -142,21 +166,42 @@ class CrosswordCreator():
 
         Return True if arc consistency is enforced and no domains are empty;
         return False if one or more domains end up empty.
+
+        Only arcs between overlapping variables are ever queued, as
+        (x id, y id) pairs of `crossword.variable_ids`, and an arc
+        already waiting in the queue is not queued a second time.
         """
-        queue = [
-            (var1, var2) 
-            for var1 in self.crossword.variables 
-            for var2 in self.crossword.variables 
-            if not var1 == var2
-        ] if arcs == None else arcs
-
-        while len(queue) > 0:
-            x, y = queue.pop(0)
-            if self.revise(x, y):
-                if len(self.domains[x]) == 0:
+        variables = self.crossword.ordered_variables
+        ids = self.crossword.variable_ids
+        adjacency = self.crossword.adjacency
+        if arcs is None:
+            arcs = [
+                (x, y)
+                for x in range(len(variables))
+                for y, _, _ in adjacency[x]
+            ]
+        else:
+            arcs = [(ids[x], ids[y]) for x, y in arcs]
+
+        queue = deque()
+        queued = set()
+        for arc in arcs:
+            if arc not in queued:
+                queued.add(arc)
+                queue.append(arc)
+
+        while queue:
+            arc = queue.popleft()
+            queued.remove(arc)
+            x, y = arc
+            if self.revise(variables[x], variables[y]):
+                if not self.domains[variables[x]]:
                     return False
-                for z in self.crossword.neighbors(x) - {y}:
-                    queue.append((z, x))
+                for z, _, _ in adjacency[x]:
+                    arc = (z, x)
+                    if z != y and arc not in queued:
+                        queued.add(arc)
+                        queue.append(arc)
         return True
 
     def assignment_complete(self, assignment):
@@ -164,32 +209,53 @@ class CrosswordCreator():
         Return True if `assignment` is complete (i.e., assigns a value to each
         crossword variable); return False otherwise.
         """
-        for var in self.crossword.variables:
-            if var not in assignment.keys():
-                return False
-        return True
+        return len(assignment) == len(self.crossword.variables)
 
     def consistent(self, assignment):
         """
         Return True if `assignment` is consistent (i.e., words fit in crossword
         puzzle without conflicting characters); return False otherwise.
         """
-        
         # Check if any two words with overlap "fit" together
-        for var in assignment.keys():
-            word = assignment[var]
-            for other_var in assignment.keys():
-                if not var == other_var:
-                    other_word = assignment[other_var]
-                    overlap = self.crossword.overlaps[var, other_var]
-                    if overlap == None:
-                        continue
-                    if not word[overlap[0]] == other_word[overlap[1]]:
-                        return False
-        
+        for var, word in assignment.items():
+            var_id = self.crossword.variable_ids[var]
+            for other_id, i, j in self.crossword.adjacency[var_id]:
+                other = self.crossword.ordered_variables[other_id]
+                if other in assignment and word[i] != assignment[other][j]:
+                    return False
+
         # Check if all words are unique
         return len(assignment) == len(set(assignment.values()))
 
+    def consistent_with(self, var, assignment):
+        """
+        Return True if the word assigned to `var` fits the words of its
+        assigned neighbors and is not placed anywhere else.
+
+        Only `var` is checked, so a search that checks each variable as
+        it is assigned keeps the whole assignment consistent at a cost
+        of one step per neighbor. Uniqueness is read from `self.used`,
+        so `assignment` must be built through `assign` and `unassign`.
+        """
+        word = assignment[var]
+        if self.used[word] > 1:
+            return False
+        var_id = self.crossword.variable_ids[var]
+        for other_id, i, j in self.crossword.adjacency[var_id]:
+            other = self.crossword.ordered_variables[other_id]
+            if other in assignment and word[i] != assignment[other][j]:
+                return False
+        return True
+
+    def assign(self, assignment, var, word):
+        """Assign `word` to `var`, counting it in `self.used`."""
+        assignment[var] = word
+        self.used[word] += 1
+
+    def unassign(self, assignment, var):
+        """Remove the word of `var` from `assignment` and `self.used`."""
+        self.used[assignment.pop(var)] -= 1
+
     def order_domain_values(self, var, assignment):
         """
         Return a list of values in the domain of `var`, in order by
@@ -197,25 +263,35 @@ class CrosswordCreator():
         The first value in the list, for example, should be the one
         that rules out the fewest values among the neighbors of `var`.
         """
+        # For each unassigned neighbor, its overlap with var, its number
+        # of values and how many of them have each letter at the overlap
+        neighbors = []
+        var_id = self.crossword.variable_ids[var]
+        for other_id, i, j in self.crossword.adjacency[var_id]:
+            other = self.crossword.ordered_variables[other_id]
+            if other in assignment:
+                continue
+            domain = self.domains[other]
+            neighbors.append((
+                i, domain.bit_count(),
+                self.vocabulary.letter_counts(other.length, j, domain)
+            ))
+
         def rule_out(value):
             """
             Return the number of values the given value for var can rule out
             for neighboring variables
             """
             counter = 0
-            # For all neighboring variables not yet assigned a value
-            for other in self.crossword.neighbors(var) - set(assignment.keys()):
-                overlap = self.crossword.overlaps[var, other]
-                var_letter = value[overlap[0]]
-                for other_value in self.domains[other]:
-                    other_letter = other_value[overlap[1]]
-                    if not var_letter == other_letter:
-                        counter += 1
-                
+            for i, size, counts in neighbors:
+                counter += size - counts.get(value[i], 0)
             return counter
 
-        return sorted(self.domains[var], key=rule_out)
-    
+        return sorted(
+            self.vocabulary.decode(var.length, self.domains[var]),
+            key=rule_out
+        )
+
     def select_unassigned_variable(self, assignment):
         """
         Return an unassigned variable not already part of `assignment`.
@@ -226,13 +302,14 @@ class CrosswordCreator():
         """
         unassigned = self.crossword.variables - set(assignment.keys())
 
-        sorted_unassigned = sorted(
-            unassigned, 
-            key=lambda var: (len(self.domains[var]), -len(self.crossword.neighbors(var)))
+        return min(
+            unassigned,
+            key=lambda var: (
+                self.domains[var].bit_count(),
+                -len(self.crossword.neighbors(var))
+            )
         )
 
-        return sorted_unassigned.pop(0)
-
     def backtrack(self, assignment):
         """
         Using Backtracking Search, take as input a partial assignment for the
@@ -247,23 +324,31 @@ class CrosswordCreator():
             return assignment
         var = self.select_unassigned_variable(assignment)
         for value in self.order_domain_values(var, assignment):
-            assignment[var] = value
-            if self.consistent(assignment):
-                prev_domain = deepcopy(self.domains)
-                self.domains[var] = {value}
+            self.assign(assignment, var, value)
+            if self.consistent_with(var, assignment):
+                mark = len(self.trail)
+                self.set_domain(var, self.vocabulary.bit(value))
                 inference = self.inference(var, assignment)
                 if inference is not None:
-                    assignment.update(inference)
-                    result = self.backtrack(assignment)
-                    if not result == None:
-                        return result
-                    else:
-                        # Delete all the inferences added to assignment
-                        for inference_var in inference.keys():
-                            del assignment[inference_var]
+                    for inference_var, word in inference.items():
+                        self.assign(assignment, inference_var, word)
+                    # Inferred words can clash with each other or repeat
+                    # words already placed
+                    if all(
+                        self.consistent_with(inference_var, assignment)
+                        for inference_var in inference.keys()
+                    ):
+                        result = self.backtrack(assignment)
+                        if result is not None:
+                            return result
+                    # Delete all the inferences added to assignment
+                    for inference_var in inference.keys():
+                        self.unassign(assignment, inference_var)
+                # Undo the domains pruned by this value and its inference
+                self.undo(mark)
             # Assignment of value is wrong for var, delete assignemnt
-            del assignment[var]
-                
+            self.unassign(assignment, var)
+
         # Current var has no value in its domain that works
         return None
 
@@ -280,10 +365,13 @@ class CrosswordCreator():
         # aka a variable has only one value left in domain (add) or none left (abort)
         new_inferences = dict()
         for var in set(self.domains.keys()) - set(assignment.keys()):
-            if len(self.domains[var]) == 0:
+            domain = self.domains[var]
+            if not domain:
                 return None
-            if len(self.domains[var]) == 1:
-                new_inferences[var] = list(self.domains[var])[0]
+            if domain.bit_count() == 1:
+                new_inferences[var] = self.vocabulary.words[var.length][
+                    domain.bit_length() - 1
+                ]
         return new_inferences
 
 
@@ -0,0 +1,263 @@
+import hashlib
+import os
+import struct
+import tempfile
+
+# Suffix of the index file cached next to a words file
+SUFFIX = ".vocabulary"
+
+# Bump whenever the layout of the cached index changes
+VERSION = 2
+
+MAGIC = b"VOCABULA"
+
+# Magic, version and digest of the words file, then number of lengths
+HEADER = struct.Struct("<8sI16sI")
+
+# Word length and byte length of its words, joined by newlines
+LENGTH = struct.Struct("<II")
+
+# Number of letters at one position of one word length
+LETTERS = struct.Struct("<I")
+
+# Code point of a letter and byte length of its bitset
+MASK = struct.Struct("<II")
+
+
+class Vocabulary():
+    """
+    Words of a words file with an inverted index from (length, position,
+    letter) to the words that have that letter at that position.
+
+    Words are numbered separately for each length, since a variable can
+    only take words of its own length. A set of words of one length is an
+    int used as a bitset: bit i is set if words[length][i] is in the set.
+    For every (length, position, letter) the index keeps such a bitset in
+    masks[length, position][letter] and its size in counts.
+    """
+
+    def __init__(self, words):
+        self.words = dict()
+        for word in sorted(set(words)):
+            self.words.setdefault(len(word), []).append(word)
+        self.index()
+
+    @classmethod
+    def from_tables(cls, words, masks):
+        """
+        Return a vocabulary from a {length: sorted words} dict and the
+        letter bitsets of those words, as read back by `read`, without
+        indexing the words again.
+        """
+        vocabulary = cls.__new__(cls)
+        vocabulary.words = words
+        vocabulary.index(masks)
+        return vocabulary
+
+    def index(self, masks=None):
+        """
+        Number the words of every length and index their letters. The
+        bitsets are built from the words unless `masks` is given.
+        """
+        self.ids = {
+            word: i
+            for words in self.words.values() for i, word in enumerate(words)
+        }
+
+        self.full_masks = {
+            length: (1 << len(words)) - 1
+            for length, words in self.words.items()
+        }
+        if masks is None:
+            masks = dict()
+            for length, words in self.words.items():
+                for position in range(length):
+                    ids = dict()
+                    for i, word in enumerate(words):
+                        ids.setdefault(word[position], []).append(i)
+                    masks[length, position] = {
+                        letter: bitset(letter_ids)
+                        for letter, letter_ids in ids.items()
+                    }
+        self.masks = masks
+        self.counts = {
+            key: {letter: mask.bit_count() for letter, mask in masks.items()}
+            for key, masks in self.masks.items()
+        }
+
+    @classmethod
+    def load(cls, path):
+        """
+        Return the vocabulary of a words file with one word per line,
+        upper-cased. The index is cached next to the file, keyed by a
+        hash of its contents, and only rebuilt when the file changes.
+        The cache holds only strings and integers (see `dump`), so
+        reading a tampered cache file cannot run code.
+        """
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+
+        cache = path + SUFFIX
+        try:
+            with open(cache, "rb") as f:
+                vocabulary = read(f.read(), digest)
+            if vocabulary is not None:
+                return vocabulary
+        except OSError:
+            pass
+
+        vocabulary = cls(data.decode("utf-8").upper().splitlines())
+        try:
+            write(cache, dump(vocabulary, digest))
+        except OSError:
+            # Read-only data directories still work, just without a cache
+            pass
+        return vocabulary
+
+    def __contains__(self, word):
+        return word in self.ids
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def full(self, length):
+        """Return the bitset of every word of a length."""
+        return self.full_masks.get(length, 0)
+
+    def bit(self, word):
+        """Return the bitset holding just `word`."""
+        return 1 << self.ids[word]
+
+    def decode(self, length, bits):
+        """Return the list of words of a length in a bitset."""
+        words = self.words.get(length, [])
+        return [words[i] for i in set_bits(bits)]
+
+    def letters(self, length, position):
+        """
+        Return a {letter: bitset} dict grouping the words of a length
+        by their letter at `position`.
+        """
+        return self.masks.get((length, position), dict())
+
+    def letter_counts(self, length, position, bits):
+        """
+        Return a {letter: count} dict of how many words in a bitset of
+        words of a length have each letter at `position`. If the bitset
+        still holds every word of the length, the counts are read from
+        the index instead of counted.
+        """
+        if bits == self.full(length):
+            return self.counts.get((length, position), dict())
+        return {
+            letter: (bits & mask).bit_count()
+            for letter, mask in self.letters(length, position).items()
+        }
+
+    def supported(self, length, position, other_length, other_position,
+                  other_bits):
+        """
+        Return the bitset of words of `length` whose letter at `position`
+        is the letter at `other_position` of some word in `other_bits`,
+        a bitset of words of `other_length`.
+        """
+        masks = self.letters(length, position)
+        supported = 0
+        for letter, mask in self.letters(other_length, other_position).items():
+            if letter in masks and other_bits & mask:
+                supported |= masks[letter]
+        return supported
+
+
+def bitset(ids):
+    """Return an int with the given bits set."""
+    ids = list(ids)
+    if not ids:
+        return 0
+    data = bytearray(max(ids) // 8 + 1)
+    for i in ids:
+        data[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(data, "little")
+
+
+def set_bits(bits):
+    """Return the positions of the bits set in an int, in increasing order."""
+    digits = bin(bits)[:1:-1]
+    positions = []
+    i = digits.find("1")
+    while i != -1:
+        positions.append(i)
+        i = digits.find("1", i + 1)
+    return positions
+
+
+def dump(vocabulary, digest):
+    """
+    Return the words and letter bitsets of a vocabulary as bytes: a
+    HEADER, then for each word length its words and, for each position,
+    every letter with its bitset as little-endian bytes.
+    """
+    parts = [HEADER.pack(MAGIC, VERSION, digest, len(vocabulary.words))]
+    for length, words in vocabulary.words.items():
+        blob = "\n".join(words).encode("utf-8")
+        parts.append(LENGTH.pack(length, len(blob)))
+        parts.append(blob)
+        for position in range(length):
+            masks = vocabulary.letters(length, position)
+            parts.append(LETTERS.pack(len(masks)))
+            for letter, mask in masks.items():
+                data = mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+                parts.append(MASK.pack(ord(letter), len(data)))
+                parts.append(data)
+    return b"".join(parts)
+
+
+def read(data, digest):
+    """
+    Return the Vocabulary stored in bytes written by `dump`, or None if
+    they are not a cache of the words file hashed to `digest`. The
+    header is checked before anything else is parsed.
+    """
+    try:
+        magic, version, cached_digest, count = HEADER.unpack_from(data)
+        if (magic, version, cached_digest) != (MAGIC, VERSION, digest):
+            return None
+
+        offset = HEADER.size
+        words, masks = dict(), dict()
+        for _ in range(count):
+            length, size = LENGTH.unpack_from(data, offset)
+            offset += LENGTH.size
+            blob = str(data[offset:offset + size], "utf-8")
+            words[length] = blob.split("\n")
+            offset += size
+            for position in range(length):
+                letters, = LETTERS.unpack_from(data, offset)
+                offset += LETTERS.size
+                masks[length, position] = dict()
+                for _ in range(letters):
+                    letter, size = MASK.unpack_from(data, offset)
+                    offset += MASK.size
+                    masks[length, position][chr(letter)] = int.from_bytes(
+                        data[offset:offset + size], "little"
+                    )
+                    offset += size
+    except (struct.error, UnicodeDecodeError, ValueError):
+        return None
+    return Vocabulary.from_tables(words, masks)
+
+
+def write(path, contents):
+    """Write bytes to a file through a temporary file."""
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(contents)
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
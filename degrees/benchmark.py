@@ -0,0 +1,322 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+
+import snapshot
+
+from ingest import ingest
+from landmarks import COUNT, LandmarkIndex, distances_from
+from nameindex import MAX_TYPOS, NameIndex
+
+# Path lengths searched by default
+LENGTHS = [1, 2, 3, 4, 5, 6]
+
+# Characters typos are drawn from in fuzzy lookups
+TYPO_CHARACTERS = "abcdefghijklmnopqrstuvwxyz0123456789 "
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark degrees on a synthetic co-star graph",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument("--people", type=int, default=100000)
+    parser.add_argument("--movies", type=int, default=40000)
+    parser.add_argument(
+        "--cast", type=int, default=4, help="mean number of stars per movie"
+    )
+    parser.add_argument(
+        "--distribution", choices=["uniform", "powerlaw"], default="powerlaw",
+        help="how roles are spread over people"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--lengths", type=int, nargs="+", default=LENGTHS,
+        help="path lengths to time searches at"
+    )
+    parser.add_argument(
+        "--pairs", type=int, default=20,
+        help="number of pairs searched per path length"
+    )
+    parser.add_argument(
+        "--landmarks", type=int, default=COUNT,
+        help="number of landmarks in the timed landmark index"
+    )
+    parser.add_argument(
+        "--lookups", type=int, default=200,
+        help="number of misspelled names looked up by fuzzy search"
+    )
+    parser.add_argument(
+        "--directory",
+        help="write the dataset here and keep it (default: temporary)"
+    )
+    parser.add_argument(
+        "--output", help="write JSON results here instead of stdout"
+    )
+    args = parser.parse_args()
+
+    if args.directory:
+        os.makedirs(args.directory, exist_ok=True)
+        results = run(args, args.directory)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            results = run(args, directory)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+def run(args, directory):
+    """
+    Generate a dataset in `directory`, time every stage over it
+    and return the results as a dict.
+    """
+    rng = random.Random(args.seed)
+    generate(
+        directory, args.people, args.movies, args.cast, args.distribution, rng
+    )
+
+    results = {
+        "commit": commit(),
+        "python": platform.python_version(),
+        "parameters": {
+            "people": args.people, "movies": args.movies, "cast": args.cast,
+            "distribution": args.distribution, "seed": args.seed,
+        },
+        "timings": {},
+    }
+    timings = results["timings"]
+
+    # Remove any snapshot so the first load parses the CSV files
+    path = os.path.join(directory, snapshot.FILENAME)
+    if os.path.exists(path):
+        os.remove(path)
+    start = time.perf_counter()
+    graph, report = ingest(directory)
+    timings["ingest_seconds"] = time.perf_counter() - start
+    results["rows"] = report
+
+    start = time.perf_counter()
+    snapshot.write(graph, path, snapshot.source_stats(directory))
+    timings["snapshot_write_seconds"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    graph = snapshot.load(directory)
+    timings["snapshot_load_seconds"] = time.perf_counter() - start
+
+    sample = [rng.randrange(len(graph)) for _ in range(1000)]
+    start = time.perf_counter()
+    expanded = sum(1 for person in sample for _ in graph.neighbors(person))
+    elapsed = time.perf_counter() - start
+    timings["neighbors_per_second"] = expanded / elapsed if elapsed else None
+
+    buckets = find_pairs(graph, args.lengths, args.pairs, rng)
+    timings["search"] = time_searches(graph, buckets)
+    timings["landmarks"] = time_landmarks(graph, buckets, args.landmarks)
+    timings["fuzzy"] = time_fuzzy(graph, args.lookups, rng)
+    return results
+
+
+def generate(directory, people, movies, cast, distribution, rng):
+    """
+    Write people.csv, movies.csv and stars.csv for a random bipartite
+    graph. Each movie casts `cast` stars on average. With "powerlaw",
+    people are picked with Zipf-like weights, so a few star in many
+    movies as on IMDb; with "uniform" every person is equally likely.
+    """
+    with open(os.path.join(directory, "people.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for i in range(people):
+            writer.writerow([i, f"Person {i}", 1900 + rng.randrange(110)])
+
+    with open(os.path.join(directory, "movies.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "title", "year"])
+        for i in range(movies):
+            writer.writerow([i, f"Movie {i}", 1920 + rng.randrange(100)])
+
+    # Cumulative weights are computed once, not on every draw
+    cumulative = None
+    if distribution == "powerlaw":
+        cumulative = list(itertools.accumulate(
+            1 / (rank + 1) ** 0.8 for rank in range(people)
+        ))
+    population = range(people)
+
+    with open(os.path.join(directory, "stars.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        for movie in range(movies):
+            size = max(1, min(people, round(rng.expovariate(1 / cast))))
+            stars = set(
+                rng.choices(population, cum_weights=cumulative, k=size)
+            )
+            for person in stars:
+                writer.writerow([person, movie])
+
+
+def find_pairs(graph, lengths, pairs, rng):
+    """
+    Return up to `pairs` (source, target) pairs of people for each path
+    length, found from the BFS distances of random sources.
+    """
+    buckets = {length: [] for length in lengths}
+    for _ in range(50):
+        if all(len(bucket) >= pairs for bucket in buckets.values()):
+            break
+        source = rng.randrange(len(graph))
+        distances = distances_from(graph, source)
+        for length in lengths:
+            if len(buckets[length]) >= pairs:
+                continue
+            targets = [
+                person for person, distance in enumerate(distances)
+                if distance == length
+            ]
+            if targets:
+                buckets[length].append((source, rng.choice(targets)))
+    return buckets
+
+
+def time_searches(graph, buckets, landmarks=None):
+    """
+    Return search timings for the pairs of people at each path length,
+    searching with the landmark index `landmarks` if given.
+    """
+    timings = []
+    for length, bucket in buckets.items():
+        if not bucket:
+            timings.append({"length": length, "pairs": 0})
+            continue
+        start = time.perf_counter()
+        for source, target in bucket:
+            path = graph.shortest_index_path(source, target, landmarks)
+            assert len(path) == length
+        elapsed = time.perf_counter() - start
+        timings.append({
+            "length": length,
+            "pairs": len(bucket),
+            "seconds_per_search": elapsed / len(bucket),
+        })
+    return timings
+
+
+def time_landmarks(graph, buckets, count):
+    """
+    Return timings of building a landmark index of `count` landmarks,
+    and for each path length the share of pairs whose bounds agree and
+    the time of `Graph.distance` and of searches without and with it.
+    """
+    start = time.perf_counter()
+    index = LandmarkIndex.build(graph, count)
+    build = time.perf_counter() - start
+
+    searches = time_searches(graph, buckets, index)
+    timings = []
+    for (length, bucket), search in zip(buckets.items(), searches):
+        timing = {"length": length, "pairs": len(bucket)}
+        timings.append(timing)
+        if not bucket:
+            continue
+        exact = sum(
+            lower == upper
+            for lower, upper in (
+                index.bounds(source, target) for source, target in bucket
+            )
+        )
+        timing["exact_bounds"] = exact / len(bucket)
+        timing["seconds_per_search"] = search["seconds_per_search"]
+        for name, landmarks in [("without", None), ("with", index)]:
+            start = time.perf_counter()
+            for source, target in bucket:
+                assert graph.distance(source, target, landmarks) == length
+            elapsed = time.perf_counter() - start
+            timing[f"seconds_per_distance_{name}"] = elapsed / len(bucket)
+    return {
+        "landmarks": len(index.landmarks),
+        "build_seconds": build,
+        "lengths": timings,
+    }
+
+
+def time_fuzzy(graph, lookups, rng):
+    """
+    Return timings of building the fuzzy name index and of looking up
+    the names of random people with 1 to MAX_TYPOS random typos each,
+    with the share of lookups that found the misspelled person among
+    the closest matches returned.
+    """
+    index = NameIndex(graph)
+    start = time.perf_counter()
+    index.build()
+    build = time.perf_counter() - start
+
+    queries = []
+    for _ in range(lookups):
+        person = rng.randrange(len(graph))
+        queries.append(
+            (person, misspell(graph.lower_name(person), MAX_TYPOS, rng))
+        )
+
+    found = 0
+    start = time.perf_counter()
+    for person, query in queries:
+        matches = index.fuzzy(query)
+        found += any(match == person for _, match in matches)
+    elapsed = time.perf_counter() - start
+    return {
+        "build_seconds": build,
+        "lookups": lookups,
+        "seconds_per_lookup": elapsed / lookups if lookups else None,
+        "found": found / lookups if lookups else None,
+    }
+
+
+def misspell(name, typos, rng):
+    """
+    Return `name` with between 1 and `typos` random characters
+    substituted, inserted or deleted.
+    """
+    for _ in range(rng.randint(1, typos)):
+        position = rng.randrange(len(name) + 1)
+        edit = rng.choice(["substitute", "insert", "delete"])
+        if edit == "insert" or position == len(name):
+            name = (
+                name[:position] + rng.choice(TYPO_CHARACTERS) + name[position:]
+            )
+        elif edit == "substitute":
+            name = (
+                name[:position] + rng.choice(TYPO_CHARACTERS)
+                + name[position + 1:]
+            )
+        else:
+            name = name[:position] + name[position + 1:]
+    return name
+
+
+def commit():
+    """Return the current git commit hash, or None outside a git tree."""
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,13 @@
-import csv
+import argparse
+import itertools
 import sys
 
+import landmarks
+import nameindex
+import service
+import snapshot
+
+from graph import NamesView, PeopleView, MoviesView
 from util import Node, StackFrontier, QueueFrontier
 
 # Maps names to a set of corresponding person_ids
@@ -12,60 +19,101 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Most paths yielded by all_shortest_paths unless told otherwise
+PATH_LIMIT = 1000
+
+# Integer-indexed co-star graph loaded by load_data,
+# names, people and movies above become read-only views over it
+graph = None
+
+# Landmark distance index of the graph, if one was built with landmarks.py
+landmark_index = None
+
+# Prefix and fuzzy name lookups over the graph
+name_index = None
+
 
 def load_data(directory):
     """
     Load data from CSV files into memory.
+
+    The parsed graph and its fuzzy name index are kept in a binary
+    snapshot next to the CSV files and memory-mapped on later runs, so
+    only the first run parses them.
+    A landmark index built by landmarks.py is loaded too, if up to date.
+
+    Returns a dict counting kept and skipped rows when the CSV files were
+    parsed (see ingest.ingest), or an empty dict when the snapshot was used.
     """
-    # Load people
-    with open(f"{directory}/people.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            people[row["id"]] = {
-                "name": row["name"],
-                "birth": row["birth"],
-                "movies": set()
-            }
-            if row["name"].lower() not in names:
-                names[row["name"].lower()] = {row["id"]}
-            else:
-                names[row["name"].lower()].add(row["id"])
-
-    # Load movies
-    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            movies[row["id"]] = {
-                "title": row["title"],
-                "year": row["year"],
-                "stars": set()
-            }
-
-    # Load stars
-    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
-            except KeyError:
-                pass
+    global graph, landmark_index, name_index, names, people, movies
+
+    report = {}
+    graph = snapshot.load(directory, report)
+    landmark_index = landmarks.load(directory)
+    name_index = nameindex.NameIndex(graph)
+    names = NamesView(graph)
+    people = PeopleView(graph)
+    movies = MoviesView(graph)
+    return report
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser(
+        description="Find degrees of separation between two people"
+    )
+    parser.add_argument(
+        "directory", nargs="?", default="large",
+        help="directory holding people.csv, movies.csv and stars.csv"
+    )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--batch", metavar="FILE",
+        help="answer tab separated name pairs from FILE ('-' for stdin), "
+             "writing one JSON result per line"
+    )
+    mode.add_argument(
+        "--serve", metavar="PORT", type=int,
+        help="answer queries over HTTP on PORT (0 picks a free port)"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="number of worker processes for --batch and --serve"
+    )
+    parser.add_argument(
+        "--policy", choices=nameindex.POLICIES, default=nameindex.ASK,
+        help="how to pick among people sharing a name "
+             "('ask' reports an error in --batch and --serve)"
+    )
+    parser.add_argument(
+        "--fuzzy", action="store_true",
+        help="fall back to the closest names when a name has no exact match"
+    )
+    args = parser.parse_args()
+    directory = args.directory
+    options = (args.workers, args.policy, args.fuzzy)
+
+    if args.batch is not None:
+        if args.batch == "-":
+            source = sys.stdin
+        else:
+            source = open(args.batch, encoding="utf-8")
+        with source:
+            service.run_batch(directory, source, sys.stdout, *options)
+        return
+    if args.serve is not None:
+        service.serve(directory, args.serve, *options)
+        return
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    report = load_data(directory)
     print("Data loaded.")
+    print_report(report)
 
-    source = person_id_for_name(input("Name: "))
+    source = person_id_for_name(input("Name: "), args.policy, args.fuzzy)
     if source is None:
         sys.exit("Person not found.")
-    target = person_id_for_name(input("Name: "))
+    target = person_id_for_name(input("Name: "), args.policy, args.fuzzy)
     if target is None:
         sys.exit("Person not found.")
 
@@ -83,41 +131,103 @@ def main():
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def print_report(report):
+    """
+    Print how many rows were skipped while parsing the CSV files.
+    """
+    skipped = {
+        "duplicate people": report.get("duplicate_people", 0),
+        "duplicate movies": report.get("duplicate_movies", 0),
+        "stars naming unknown people": report.get("unknown_people", 0),
+        "stars naming unknown movies": report.get("unknown_movies", 0),
+        "malformed rows": report.get("malformed", 0),
+    }
+    for reason, count in skipped.items():
+        if count:
+            print(f"Skipped {count} {reason}.")
+
+
+def shortest_path(source, target, bidirectional=True):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
+    If `bidirectional` is True, frontiers are grown from both the source
+    and the target until they meet; otherwise a plain breadth first search
+    is run from the source.
+
     If no possible path, returns None.
     """
+    if bidirectional:
+        return graph.shortest_path(source, target, landmark_index)
+    if source == target:
+        return []
+    source = graph.person_index(source)
+    target = graph.person_index(target)
 
     # Initialize queue and explored set with source node
+    # States are person indices, only the path found is mapped back to ids
+    # Explored set is keyed on person so each person is queued only once
     frontier = QueueFrontier()
-    explored_set = set()
-    source = Node(source, None, None)
-    frontier.add(source)
-    explored_set.add(source)
+    explored_set = {source}
+    frontier.add(Node(source, None, None))
 
     while True:
         # No connection
         if frontier.empty():
             break
-        
+
         curr_node = frontier.remove()
-        explored_set.add(curr_node)
 
         # For all adjacent nodes
-        for pair in neighbors_for_person(curr_node.state):
-            new_node = Node(pair[1], curr_node, pair[0])
+        for movie, person in graph.neighbors(curr_node.state):
+            if person in explored_set:
+                continue
+            new_node = Node(person, curr_node, movie)
             if new_node.state == target:
-                return generate_answer(new_node)
-            if new_node not in explored_set and not frontier.contains_state(new_node.state):
-                frontier.add(new_node)
-                explored_set.add(new_node)
-    
+                return [
+                    (graph.movie_ids[movie], graph.person_ids[person])
+                    for movie, person in generate_answer(new_node)
+                ]
+            frontier.add(new_node)
+            explored_set.add(person)
+
     return None
 
 
+def all_shortest_paths(source, target, limit=PATH_LIMIT):
+    """
+    Yields every shortest list of (movie_id, person_id) pairs that
+    connect the source to the target, lazily and at most `limit` of
+    them (no cap if `limit` is None). The first k paths yielded are k
+    distinct shortest paths.
+
+    Yields nothing if the source and target are not connected.
+    """
+    paths = graph.all_shortest_index_paths(
+        graph.person_index(source), graph.person_index(target)
+    )
+    for path in itertools.islice(paths, limit):
+        yield [
+            (graph.movie_ids[movie], graph.person_ids[person])
+            for movie, person in path
+        ]
+
+
+def distance(source, target):
+    """
+    Returns the degrees of separation between the source and the target,
+    or None if they are not connected.
+
+    Only the length is computed, so pairs the landmark index can bound
+    exactly are answered without searching.
+    """
+    return graph.distance(
+        graph.person_index(source), graph.person_index(target),
+        landmark_index
+    )
+
+
 def generate_answer(node):
     """
     Returns a list with (a,s) pairs in correct order
@@ -136,15 +246,23 @@ def generate_answer(node):
     return answer
 
 
-def person_id_for_name(name):
+def person_id_for_name(name, policy=nameindex.ASK, fuzzy=False):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
+
+    Ambiguous names are resolved by asking the user unless `policy` is
+    another of nameindex.POLICIES. If `fuzzy` is True, a name with no
+    exact match falls back to the closest names within a few typos.
     """
-    person_ids = list(names.get(name.lower(), set()))
+    people_indices = name_index.candidates(name, fuzzy)
+    person_ids = [graph.person_ids[person] for person in people_indices]
     if len(person_ids) == 0:
         return None
     elif len(person_ids) > 1:
+        chosen = nameindex.choose(graph, people_indices, policy)
+        if chosen is not None:
+            return graph.person_ids[chosen]
         print(f"Which '{name}'?")
         for person_id in person_ids:
             person = people[person_id]
@@ -167,12 +285,13 @@ def neighbors_for_person(person_id):
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
-    movie_ids = people[person_id]["movies"]
-    neighbors = set()
-    for movie_id in movie_ids:
-        for person_id in movies[movie_id]["stars"]:
-            neighbors.add((movie_id, person_id))
-    return neighbors
+    person = graph.person_index(person_id)
+    if person is None:
+        raise KeyError(person_id)
+    return {
+        (graph.movie_ids[movie], graph.person_ids[other])
+        for movie, other in graph.neighbors(person)
+    }
 
 
 if __name__ == "__main__":
@@ -0,0 +1,512 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
+
+
+# Integer sections of a graph, each an array of C ints
+ARRAY_SECTIONS = [
+    "person_offsets", "person_movies", "movie_offsets", "movie_people",
+    "person_order", "movie_order", "name_order",
+]
+
+# String sections of a graph, each a StringTable
+STRING_SECTIONS = [
+    "person_ids", "person_names", "person_births",
+    "movie_ids", "movie_titles", "movie_years",
+]
+
+# Sections of the fuzzy name index (see nameindex.NameIndex) and their
+# typecodes, None until the index is built
+NAME_INDEX_SECTIONS = {"name_groups": "i", "name_deletions": "q"}
+
+
+class Graph():
+    """
+    Co-star graph where people and movies are mapped to dense integer
+    indices and adjacency is stored in compressed sparse row (CSR) form.
+
+    The movies of person `p` are
+        person_movies[person_offsets[p]:person_offsets[p + 1]]
+    and the stars of movie `m` are
+        movie_people[movie_offsets[m]:movie_offsets[m + 1]]
+
+    Ids, names and titles live in StringTables. `person_order`,
+    `movie_order` and `name_order` list indices sorted by id and by
+    lowercased name so lookups are binary searches. Every section is a
+    flat buffer, so a graph can be backed by a memory-mapped snapshot,
+    which also holds the fuzzy name index in the NAME_INDEX_SECTIONS.
+    """
+
+    def __init__(self, sections):
+        """
+        Create a graph from a dict with an entry for every name in
+        ARRAY_SECTIONS and STRING_SECTIONS, and optionally for those
+        in NAME_INDEX_SECTIONS.
+        """
+        for name in ARRAY_SECTIONS + STRING_SECTIONS:
+            setattr(self, name, sections[name])
+        for name in NAME_INDEX_SECTIONS:
+            setattr(self, name, sections.get(name))
+
+        # Search state, allocated on first search and reset after each one
+        self.search = None
+
+    @classmethod
+    def from_edges(cls, tables, edge_people, edge_movies):
+        """
+        Build a graph from a dict with a StringTable for every name in
+        STRING_SECTIONS, and two parallel arrays of person and movie
+        indices with one entry per starring role.
+        """
+        person_count = len(tables["person_ids"])
+        movie_count = len(tables["movie_ids"])
+        sections = {name: tables[name] for name in STRING_SECTIONS}
+        sections["person_offsets"], sections["person_movies"] = compress(
+            person_count, edge_people, edge_movies
+        )
+        sections["movie_offsets"], sections["movie_people"] = compress(
+            movie_count, edge_movies, edge_people
+        )
+        sections["person_order"] = sorted_order(tables["person_ids"])
+        sections["movie_order"] = sorted_order(tables["movie_ids"])
+        names = tables["person_names"]
+        sections["name_order"] = sorted_order(
+            names, key=lambda person: names[person].lower()
+        )
+        return cls(sections)
+
+    def person_index(self, person_id):
+        """Return the index of a person id, or None if unknown."""
+        matches = lookup(
+            self.person_order, self.person_ids.__getitem__, person_id
+        )
+        return matches[0] if matches else None
+
+    def movie_index(self, movie_id):
+        """Return the index of a movie id, or None if unknown."""
+        matches = lookup(
+            self.movie_order, self.movie_ids.__getitem__, movie_id
+        )
+        return matches[0] if matches else None
+
+    def people_named(self, name):
+        """Return indices of all people whose lowercased name is `name`."""
+        return lookup(self.name_order, self.lower_name, name)
+
+    def lower_name(self, person):
+        """Return the lowercased name of a person index."""
+        return self.person_names[person].lower()
+
+    def __len__(self):
+        return len(self.person_ids)
+
+    def movies_of(self, person):
+        """Return the movie indices a person index starred in."""
+        offsets = self.person_offsets
+        return self.person_movies[offsets[person]:offsets[person + 1]]
+
+    def stars_of(self, movie):
+        """Return the person indices starring in a movie index."""
+        offsets = self.movie_offsets
+        return self.movie_people[offsets[movie]:offsets[movie + 1]]
+
+    def neighbors(self, person):
+        """
+        Yield (movie, person) index pairs for people who starred
+        with a given person index.
+        """
+        for movie in self.movies_of(person):
+            for other in self.stars_of(movie):
+                if other != person:
+                    yield movie, other
+
+    def shortest_path(self, source_id, target_id, landmarks=None):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target, using the original ids.
+
+        If no possible path, returns None.
+        """
+        source = self.person_index(source_id)
+        target = self.person_index(target_id)
+        path = self.shortest_index_path(source, target, landmarks)
+        if path is None:
+            return None
+        return [
+            (self.movie_ids[movie], self.person_ids[person])
+            for movie, person in path
+        ]
+
+    def all_shortest_index_paths(self, source, target):
+        """
+        Yield every shortest list of (movie, person) index pairs that
+        connects the source index to the target index, lazily.
+
+        A single breadth first search labels people with their depth from
+        the source. Paths are then walked back from the target, each step
+        going to a co-star one layer closer to the source, so every
+        partial path completes and no search is repeated.
+        """
+        depth = self.layer_depths(source, target)
+        if depth is None:
+            return
+
+        def walk(person):
+            if person == source:
+                yield []
+                return
+            for movie, parent in self.parents(person, depth):
+                for path in walk(parent):
+                    yield path + [(movie, person)]
+
+        yield from walk(target)
+
+    def layer_depths(self, source, target):
+        """
+        Return a dict of breadth first search depths from the source index,
+        complete for every layer before the target's, or None if the
+        target cannot be reached.
+        """
+        depth = {source: 0}
+        movie_seen = set()
+        frontier = [source]
+        while frontier and target not in depth:
+            next_frontier = []
+            for person in frontier:
+                for movie in self.movies_of(person):
+                    if movie in movie_seen:
+                        continue
+                    movie_seen.add(movie)
+                    for neighbor in self.stars_of(movie):
+                        if neighbor not in depth:
+                            depth[neighbor] = depth[person] + 1
+                            next_frontier.append(neighbor)
+            frontier = next_frontier
+        return depth if target in depth else None
+
+    def parents(self, person, depth):
+        """
+        Yield distinct (movie, person) index pairs for co-stars of
+        `person` one layer closer to the source in `depth`.
+        """
+        seen = set()
+        for movie in self.movies_of(person):
+            for parent in self.stars_of(movie):
+                if depth.get(parent) == depth[person] - 1:
+                    if (movie, parent) not in seen:
+                        seen.add((movie, parent))
+                        yield movie, parent
+
+    def distance(self, source, target, landmarks=None):
+        """
+        Returns the degrees of separation between two person indices,
+        or None if they are not connected.
+
+        With a landmark index, pairs whose lower and upper bounds agree
+        are answered without searching.
+        """
+        if landmarks is not None:
+            bounds = landmarks.bounds(source, target)
+            if bounds is None:
+                return None
+            if bounds[0] == bounds[1]:
+                return bounds[0]
+        path = self.shortest_index_path(source, target, landmarks)
+        return None if path is None else len(path)
+
+    def shortest_index_path(self, source, target, landmarks=None):
+        """
+        Returns the shortest list of (movie, person) index pairs that
+        connect the source index to the target index, or None.
+
+        Runs a bidirectional breadth first search over the preallocated
+        search arrays, always expanding a whole layer of the smaller
+        frontier so the best meeting point of that layer is kept.
+
+        With a landmark index, pairs it proves disconnected return at once.
+        The index is not used to prune the search itself: checking the
+        bound of every person reached was measured to cost more than the
+        people it skipped (see `benchmark.time_landmarks`).
+        """
+        if source == target:
+            return []
+        if landmarks is not None:
+            if landmarks.bounds(source, target) is None:
+                return None
+
+        forward, backward = self.search_state()
+        try:
+            forward.visit(source, -1, -1, 0)
+            backward.visit(target, -1, -1, 0)
+            forward_frontier, backward_frontier = [source], [target]
+
+            while forward_frontier and backward_frontier:
+                if len(forward_frontier) <= len(backward_frontier):
+                    next_frontier, meeting = self.expand(
+                        forward_frontier, forward, backward
+                    )
+                    forward_frontier = next_frontier
+                else:
+                    next_frontier, meeting = self.expand(
+                        backward_frontier, backward, forward
+                    )
+                    backward_frontier = next_frontier
+
+                if meeting is not None:
+                    return self.join(meeting, forward, backward)
+
+            return None
+        finally:
+            forward.reset()
+            backward.reset()
+
+    def expand(self, frontier, side, other):
+        """
+        Expand one layer of a search side. Return the next layer and the
+        person where it touched the other side with the shortest total
+        length, or None if the sides did not meet.
+        """
+        person_offsets, person_movies = self.person_offsets, self.person_movies
+        movie_offsets, movie_people = self.movie_offsets, self.movie_people
+        depth, other_depth = side.depth, other.depth
+        movie_seen = side.movie_seen
+
+        next_frontier, meeting, best = [], None, None
+        for person in frontier:
+            next_depth = depth[person] + 1
+            for k in range(person_offsets[person], person_offsets[person + 1]):
+                movie = person_movies[k]
+
+                # Every star of an expanded movie is already on this side
+                if movie_seen[movie]:
+                    continue
+                side.see_movie(movie)
+
+                for j in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                    neighbor = movie_people[j]
+                    if depth[neighbor] != -1:
+                        continue
+                    side.visit(neighbor, person, movie, next_depth)
+                    next_frontier.append(neighbor)
+
+                    if other_depth[neighbor] != -1:
+                        length = next_depth + other_depth[neighbor]
+                        if best is None or length < best:
+                            meeting, best = neighbor, length
+
+        return next_frontier, meeting
+
+    def join(self, meeting, forward, backward):
+        """
+        Returns (movie, person) index pairs from source to target
+        going through the person where both searches met.
+        """
+        path = []
+        crawler = meeting
+        while forward.parent[crawler] != -1:
+            path.append((forward.via[crawler], crawler))
+            crawler = forward.parent[crawler]
+        path.reverse()
+
+        crawler = meeting
+        while backward.parent[crawler] != -1:
+            child = backward.parent[crawler]
+            path.append((backward.via[crawler], child))
+            crawler = child
+
+        return path
+
+    def search_state(self):
+        """Return the (forward, backward) search sides, allocating once."""
+        if self.search is None:
+            self.search = (
+                SearchSide(len(self.person_ids), len(self.movie_ids)),
+                SearchSide(len(self.person_ids), len(self.movie_ids)),
+            )
+        return self.search
+
+
+class SearchSide():
+    """
+    Preallocated visited, depth and parent arrays for one direction of a
+    search. Only touched entries are reset, so a search costs time
+    proportional to the part of the graph it explored.
+    """
+
+    def __init__(self, people_count, movie_count):
+        self.depth = array("i", [-1]) * people_count
+        self.parent = array("i", [-1]) * people_count
+        self.via = array("i", [-1]) * people_count
+        self.movie_seen = bytearray(movie_count)
+        self.touched_people = []
+        self.touched_movies = []
+
+    def visit(self, person, parent, via, depth):
+        self.depth[person] = depth
+        self.parent[person] = parent
+        self.via[person] = via
+        self.touched_people.append(person)
+
+    def see_movie(self, movie):
+        self.movie_seen[movie] = 1
+        self.touched_movies.append(movie)
+
+    def reset(self):
+        for person in self.touched_people:
+            self.depth[person] = -1
+            self.parent[person] = -1
+            self.via[person] = -1
+        for movie in self.touched_movies:
+            self.movie_seen[movie] = 0
+        self.touched_people = []
+        self.touched_movies = []
+
+
+def compress(count, rows, columns):
+    """
+    Return (offsets, values) CSR arrays for `count` rows
+    from parallel arrays of row and column indices.
+    """
+    offsets = array("i", [0]) * (count + 1)
+    for row in rows:
+        offsets[row + 1] += 1
+    for i in range(count):
+        offsets[i + 1] += offsets[i]
+
+    values = array("i", [0]) * len(rows)
+    position = array("i", offsets[:count])
+    for row, column in zip(rows, columns):
+        values[position[row]] = column
+        position[row] += 1
+
+    return offsets, values
+
+
+class StringTable():
+    """
+    Read-only sequence of strings stored as one UTF-8 blob
+    plus an array of byte offsets into it.
+    """
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    @classmethod
+    def empty(cls):
+        """Return a new table ready to be filled with `append`."""
+        return cls(array("q", [0]), bytearray())
+
+    def append(self, string):
+        """Add a string to the end of a table that is still being built."""
+        self.blob += string.encode("utf-8")
+        self.offsets.append(len(self.blob))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+
+class PeopleView(Mapping):
+    """
+    Maps person_ids to a dictionary of: name, birth, movies (a set of
+    movie_ids), reading from a graph on every access.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, person_id):
+        person = self.graph.person_index(person_id)
+        if person is None:
+            raise KeyError(person_id)
+        return {
+            "name": self.graph.person_names[person],
+            "birth": self.graph.person_births[person],
+            "movies": set(
+                self.graph.movie_ids[movie]
+                for movie in self.graph.movies_of(person)
+            )
+        }
+
+    def __iter__(self):
+        return iter(self.graph.person_ids)
+
+    def __len__(self):
+        return len(self.graph.person_ids)
+
+
+class MoviesView(Mapping):
+    """
+    Maps movie_ids to a dictionary of: title, year, stars (a set of
+    person_ids), reading from a graph on every access.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, movie_id):
+        movie = self.graph.movie_index(movie_id)
+        if movie is None:
+            raise KeyError(movie_id)
+        return {
+            "title": self.graph.movie_titles[movie],
+            "year": self.graph.movie_years[movie],
+            "stars": set(
+                self.graph.person_ids[person]
+                for person in self.graph.stars_of(movie)
+            )
+        }
+
+    def __iter__(self):
+        return iter(self.graph.movie_ids)
+
+    def __len__(self):
+        return len(self.graph.movie_ids)
+
+
+class NamesView(Mapping):
+    """
+    Maps lowercased names to a set of corresponding person_ids,
+    reading from a graph on every access.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, name):
+        people = self.graph.people_named(name)
+        if not people:
+            raise KeyError(name)
+        return set(self.graph.person_ids[person] for person in people)
+
+    def __iter__(self):
+        seen = None
+        for person in self.graph.name_order:
+            name = self.graph.lower_name(person)
+            if name != seen:
+                seen = name
+                yield name
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+def sorted_order(keys, key=None):
+    """
+    Return an array of indices of `keys` in sorted key order,
+    comparing `key(index)` instead of the keys if given.
+    """
+    return array("i", sorted(range(len(keys)), key=key or keys.__getitem__))
+
+
+def lookup(order, key_of, key):
+    """
+    Return the indices whose key equals `key`, by binary search over
+    `order`, an array of indices sorted by `key_of(index)`.
+    """
+    start = bisect_left(order, key, key=key_of)
+    end = bisect_right(order, key, lo=start, key=key_of)
+    return [order[i] for i in range(start, end)]
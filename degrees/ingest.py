@@ -0,0 +1,115 @@
+import csv
+
+from array import array
+from itertools import islice
+
+from graph import Graph, STRING_SECTIONS, StringTable
+
+# Number of CSV rows handled at a time
+CHUNK_ROWS = 65536
+
+
+def ingest(directory, chunk_rows=CHUNK_ROWS):
+    """
+    Stream the people.csv, movies.csv and stars.csv files of a data
+    directory into a graph. Return (graph, report).
+
+    Rows are read in chunks and go straight into flat string tables and
+    edge arrays, so no per-row Python objects outlive their chunk. Only
+    the id interning dicts grow with the data.
+
+    `report` counts the rows kept and skipped:
+        people, movies, stars: rows kept
+        duplicate_people, duplicate_movies: repeated ids, first one kept
+        unknown_people, unknown_movies: star rows naming a missing id
+        malformed: rows with missing columns
+    """
+    report = dict.fromkeys([
+        "people", "movies", "stars",
+        "duplicate_people", "duplicate_movies",
+        "unknown_people", "unknown_movies", "malformed",
+    ], 0)
+    tables = {name: StringTable.empty() for name in STRING_SECTIONS}
+
+    person_tables = [
+        tables["person_ids"], tables["person_names"], tables["person_births"]
+    ]
+    person_index = intern(
+        f"{directory}/people.csv", ["id", "name", "birth"], person_tables,
+        chunk_rows, report, "people"
+    )
+    movie_tables = [
+        tables["movie_ids"], tables["movie_titles"], tables["movie_years"]
+    ]
+    movie_index = intern(
+        f"{directory}/movies.csv", ["id", "title", "year"], movie_tables,
+        chunk_rows, report, "movies"
+    )
+
+    edge_people, edge_movies = array("i"), array("i")
+    stars = read_chunks(
+        f"{directory}/stars.csv", ["person_id", "movie_id"], chunk_rows, report
+    )
+    for chunk in stars:
+        for person_id, movie_id in chunk:
+            person = person_index.get(person_id)
+            movie = movie_index.get(movie_id)
+            if person is None:
+                report["unknown_people"] += 1
+                continue
+            if movie is None:
+                report["unknown_movies"] += 1
+                continue
+            edge_people.append(person)
+            edge_movies.append(movie)
+    report["stars"] = len(edge_people)
+
+    graph = Graph.from_edges(tables, edge_people, edge_movies)
+    return graph, report
+
+
+def intern(path, columns, tables, chunk_rows, report, kind):
+    """
+    Append every row of a people or movies file to its string tables,
+    the id first. Return a dict mapping each id to its dense index.
+    """
+    index = {}
+    for chunk in read_chunks(path, columns, chunk_rows, report):
+        for row in chunk:
+            if row[0] in index:
+                report[f"duplicate_{kind}"] += 1
+                continue
+            index[row[0]] = len(index)
+            for table, value in zip(tables, row):
+                table.append(value)
+    report[kind] = len(index)
+    return index
+
+
+def read_chunks(path, columns, chunk_rows, report):
+    """
+    Yield lists of up to `chunk_rows` tuples holding the given
+    columns of a CSV file, counting malformed rows in `report`.
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        try:
+            positions = [header.index(column) for column in columns]
+        except ValueError:
+            raise ValueError(f"{path} must have columns {', '.join(columns)}")
+        width = max(positions) + 1
+
+        while True:
+            rows = list(islice(reader, chunk_rows))
+            if not rows:
+                break
+            chunk = []
+            for row in rows:
+                if not row:
+                    continue
+                if len(row) < width:
+                    report["malformed"] += 1
+                    continue
+                chunk.append(tuple(row[position] for position in positions))
+            yield chunk
@@ -0,0 +1,231 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+
+from array import array
+
+import snapshot
+
+# Name of the index file written next to the CSV files
+FILENAME = "degrees.landmarks"
+
+# Bump whenever the layout of the index changes
+VERSION = 1
+
+MAGIC = b"LANDMARK"
+
+# Magic, version, landmark count, people count, then source file stats
+HEADER = struct.Struct("=8sIII" + "qq" * len(snapshot.SOURCES))
+
+# Distance stored for people a landmark cannot reach
+UNREACHABLE = 255
+
+# Distances this large or larger are only known to be at least FAR
+FAR = 254
+
+# Number of landmarks picked by default
+COUNT = 16
+
+
+class LandmarkIndex():
+    """
+    Breadth first search distances from a few landmark people to everyone.
+
+    By the triangle inequality, for every landmark L
+        |d(L, s) - d(L, t)| <= d(s, t) <= d(L, s) + d(L, t)
+    so the index bounds the degrees of separation of any pair in
+    O(landmarks) time without searching the graph.
+    """
+
+    def __init__(self, landmarks, distances, people_count):
+        """
+        `distances` holds one uint8 row of `people_count`
+        distances per landmark, laid out one after the other.
+        """
+        self.landmarks = landmarks
+        self.distances = distances
+        self.people_count = people_count
+
+    @classmethod
+    def build(cls, graph, count=COUNT):
+        """
+        Build an index over `graph`. Landmarks are the people with the most
+        movies, skipping anyone within two degrees of a chosen landmark so
+        they spread over the graph.
+        """
+        people_count = len(graph)
+        offsets = graph.person_offsets
+        by_movies = sorted(
+            range(people_count),
+            key=lambda person: offsets[person + 1] - offsets[person],
+            reverse=True
+        )
+
+        landmarks, rows = array("i"), []
+        for person in by_movies:
+            if len(landmarks) == count:
+                break
+            if any(row[person] <= 2 for row in rows):
+                continue
+            landmarks.append(person)
+            rows.append(distances_from(graph, person))
+
+        distances = bytearray()
+        for row in rows:
+            distances += row
+        return cls(landmarks, distances, people_count)
+
+    def profile(self, person):
+        """Return the distances from every landmark to a person."""
+        return bytes(self.distances[person::self.people_count])
+
+    def bounds(self, source, target):
+        """
+        Return (lower, upper) bounds on the degrees of separation of two
+        person indices. Return None if a landmark reaches only one of them,
+        meaning they are not connected. `upper` is None when no landmark
+        reaches both.
+        """
+        return profile_bounds(self.profile(source), self.profile(target))
+
+    def save(self, path, stats):
+        """
+        Write the index to `path`, tagged with the stats of the source
+        files its graph was built from.
+        """
+        stats = [value for stat in stats for value in stat]
+        temporary = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temporary, "wb") as f:
+                f.write(HEADER.pack(
+                    MAGIC, VERSION, len(self.landmarks), self.people_count,
+                    *stats
+                ))
+                f.write(self.landmarks)
+                f.write(self.distances)
+            os.replace(temporary, path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+    @classmethod
+    def read(cls, path, stats):
+        """
+        Return the index memory-mapped from `path`, or None if there is
+        no index there or it was built from other source files.
+        """
+        try:
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        view = memoryview(mapped)
+        if len(view) < HEADER.size:
+            return None
+        magic, version, count, people_count, *saved = HEADER.unpack_from(view)
+        if (magic, version) != (MAGIC, VERSION):
+            return None
+        if saved != [value for stat in stats for value in stat]:
+            return None
+
+        start = HEADER.size
+        landmarks = view[start:start + 4 * count].cast("i")
+        start += 4 * count
+        distances = view[start:start + count * people_count]
+        return cls(landmarks, distances, people_count)
+
+
+def profile_bounds(source_profile, target_profile):
+    """
+    Return (lower, upper) bounds on the distance between two people
+    given their distances from every landmark, or None if they are
+    not connected.
+    """
+    lower, upper = 0, None
+    for source_distance, target_distance in zip(
+        source_profile, target_profile
+    ):
+        source_reached = source_distance != UNREACHABLE
+        target_reached = target_distance != UNREACHABLE
+        if source_reached != target_reached:
+            return None
+        if not source_reached:
+            continue
+        lower = max(lower, abs(source_distance - target_distance))
+        if source_distance < FAR and target_distance < FAR:
+            total = source_distance + target_distance
+            if upper is None or total < upper:
+                upper = total
+    return lower, upper
+
+
+def distances_from(graph, source):
+    """
+    Return a bytearray with the breadth first search distance from a
+    person index to every person, UNREACHABLE if there is no path.
+    Distances past FAR are stored as FAR.
+    """
+    person_offsets, person_movies = graph.person_offsets, graph.person_movies
+    movie_offsets, movie_people = graph.movie_offsets, graph.movie_people
+
+    distances = bytearray([UNREACHABLE]) * len(graph)
+    movie_seen = bytearray(len(graph.movie_ids))
+    distances[source] = 0
+    frontier, depth = [source], 0
+    while frontier:
+        depth += 1
+        next_frontier = []
+        for person in frontier:
+            for k in range(person_offsets[person], person_offsets[person + 1]):
+                movie = person_movies[k]
+                if movie_seen[movie]:
+                    continue
+                movie_seen[movie] = 1
+                for j in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                    neighbor = movie_people[j]
+                    if distances[neighbor] == UNREACHABLE:
+                        distances[neighbor] = min(depth, FAR)
+                        next_frontier.append(neighbor)
+        frontier = next_frontier
+    return distances
+
+
+def load(directory):
+    """
+    Return the landmark index saved next to the CSV files of a data
+    directory, or None if it is missing or out of date.
+    """
+    path = os.path.join(directory, FILENAME)
+    return LandmarkIndex.read(path, snapshot.source_stats(directory))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the landmark distance index of a data directory"
+    )
+    parser.add_argument(
+        "directory",
+        help="directory holding people.csv, movies.csv and stars.csv"
+    )
+    parser.add_argument(
+        "-n", "--count", type=int, default=COUNT,
+        help="number of landmarks"
+    )
+    args = parser.parse_args()
+
+    graph = snapshot.load(args.directory)
+    if len(graph) == 0:
+        sys.exit("No people to index.")
+    index = LandmarkIndex.build(graph, args.count)
+    index.save(
+        os.path.join(args.directory, FILENAME),
+        snapshot.source_stats(args.directory)
+    )
+    print(f"Indexed {len(index.landmarks)} landmarks, {len(graph)} people.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+import itertools
+
+import numpy as np
+
+from array import array
+from bisect import bisect_left
+
+# Ways to pick one person among several sharing a name
+ASK = "ask"
+MOST_CONNECTED = "most-connected"
+NEWEST = "newest"
+POLICIES = [ASK, MOST_CONNECTED, NEWEST]
+
+# Largest number of typos tolerated by fuzzy lookups
+MAX_TYPOS = 2
+
+# Characters at the start of a name whose deletions are indexed
+PREFIX = 16
+
+# Bits of an index entry holding how many characters were deleted,
+# enough for up to MAX_TYPOS
+DEPTH_BITS = 2
+DEPTH_MASK = (1 << DEPTH_BITS) - 1
+
+# Bits of an index entry holding the hash of a deleted string
+HASH_BITS = 32
+
+# 64 bit FNV-1a offset basis and prime, hashing one code point a step
+FNV_OFFSET = 0xcbf29ce484222325
+FNV_PRIME = 0x100000001b3
+
+# Names whose deletions are hashed at once while building the index
+CHUNK = 1024
+
+
+class NameIndex():
+    """
+    Prefix and typo-tolerant lookups over the names of a graph.
+
+    Prefix lookups binary search the graph's `name_order`. Fuzzy lookups
+    use a deletion index over the distinct lowercased names, built on
+    first use: every string left by deleting up to MAX_TYPOS characters
+    from a name. Two names within k edits of each other can both be
+    reduced to a common string by at most k deletions each, so the
+    deletions of the query find every name within k edits, and little
+    else, however many characters the names share. The same holds for
+    the first PREFIX characters of both names, so only those are
+    indexed, which bounds the entries per name.
+
+    The index is a sorted array of ints, each packing a hash of a
+    deleted string above the number of a name and the number of
+    characters deleted, so it takes 8 bytes per entry and a lookup is a
+    binary search. Hash collisions only add candidates, which are
+    checked by edit distance anyway. Lookups search one typo at a time,
+    using only deletions that deep, and stop as soon as enough names are
+    found, so a query with many close names is not slowed down by all
+    the names a typo further away.
+
+    The index lives in the graph's `name_groups` and `name_deletions`
+    sections. Unlike `hash`, the hash (see `hash_codes`) is the same in
+    every process, so snapshots store the index and every process
+    mapping one shares it instead of building its own.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def candidates(self, name, fuzzy=False):
+        """
+        Return the person indices named `name`. If there are none and
+        `fuzzy` is True, return the people with the closest fuzzy name.
+        """
+        people = self.graph.people_named(name.lower())
+        if people or not fuzzy:
+            return people
+        matches = self.fuzzy(name)
+        return [person for typos, person in matches if typos == matches[0][0]]
+
+    def prefix(self, prefix, limit=10):
+        """
+        Return up to `limit` person indices whose lowercased
+        name starts with `prefix`, in name order.
+        """
+        prefix = prefix.lower()
+        order = self.graph.name_order
+        start = bisect_left(order, prefix, key=self.graph.lower_name)
+        matches = []
+        for i in range(start, len(order)):
+            if len(matches) == limit:
+                break
+            if not self.graph.lower_name(order[i]).startswith(prefix):
+                break
+            matches.append(order[i])
+        return matches
+
+    def fuzzy(self, name, limit=10, max_typos=MAX_TYPOS):
+        """
+        Return up to `limit` (typos, person index) pairs for people whose
+        lowercased name is within `max_typos` edits of `name`, closest
+        first and in name order among equally close names. At most
+        MAX_TYPOS typos are tolerated, and short names tolerate fewer,
+        one per three characters, as otherwise they would match most
+        other short names.
+        """
+        name = name.lower()
+        max_typos = min(max_typos, MAX_TYPOS, len(name) // 3)
+        if max_typos <= 0:
+            return [(0, person) for person in self.graph.people_named(name)]
+
+        if self.graph.name_deletions is None:
+            self.build()
+
+        runs = self.graph.name_groups
+        keys = np.frombuffer(self.graph.name_deletions, dtype=np.int64)
+        shift = max((len(runs) - 1).bit_length(), 1) + DEPTH_BITS
+
+        # Every index entry of every deletion of the query, with the
+        # number of characters deleted from the query to get it
+        variants = deletions(name[:PREFIX], max_typos)
+        lows = hash_codes(code_points(list(variants))).astype(np.int64)
+        lows <<= shift
+        starts = np.searchsorted(keys, lows)
+        ends = np.searchsorted(keys, lows + (1 << shift))
+        found = np.flatnonzero(ends > starts)
+        entries = np.concatenate(
+            [keys[starts[i]:ends[i]] for i in found.tolist()]
+            or [np.zeros(0, dtype=np.int64)]
+        )
+        depths = np.repeat(
+            np.fromiter(variants.values(), dtype=np.int64)[found],
+            ends[found] - starts[found]
+        )
+        depths = np.maximum(depths, entries & DEPTH_MASK)
+        entries = entries >> DEPTH_BITS & ((1 << (shift - DEPTH_BITS)) - 1)
+
+        scored = []
+        matched = set()
+        order = self.graph.name_order
+        for typos in range(max_typos + 1):
+            # Names within `typos` edits share a deletion of at most
+            # `typos` characters with the query
+            groups = set(entries[depths <= typos].tolist())
+
+            # Every name newly matched in this round has exactly `typos`
+            # typos, so names are checked in name order until enough of
+            # them are found
+            for group in sorted(groups - matched):
+                if len(scored) >= limit:
+                    break
+                start, end = runs[group], runs[group + 1]
+                distance = edit_distance(
+                    name, self.graph.lower_name(order[start]), typos
+                )
+                if distance is not None:
+                    matched.add(group)
+                    scored.extend(
+                        (distance, group, order[i]) for i in range(start, end)
+                    )
+
+            # Names found later have more typos than all of these
+            if len(scored) >= limit:
+                break
+
+        scored.sort()
+        return [(distance, person) for distance, _, person in scored[:limit]]
+
+    def build(self):
+        """
+        Group `name_order` into runs of equal lowercased names and index
+        the deletions of each distinct name, as described above, into
+        the graph's name index sections.
+
+        Names are laid out as columns of PREFIX code points, CHUNK at a
+        time, so every way of deleting characters is one gather of rows
+        and hashing all of them is one pass per row.
+        """
+        order = self.graph.name_order
+        runs = array("i")
+        names = []
+        for i in range(len(order)):
+            name = self.graph.lower_name(order[i])
+            if names and name == names[-1]:
+                continue
+            names.append(name)
+            runs.append(i)
+        runs.append(len(order))
+
+        # Low bits hold the number of characters deleted, then the name's
+        # group, and the rest a hash of the string left
+        shift = max(len(names).bit_length(), 1) + DEPTH_BITS
+        if shift + HASH_BITS > 63:
+            raise ValueError(f"Too many names to index: {len(names)}")
+
+        # Rows kept by every way of deleting up to MAX_TYPOS of them,
+        # padded with a blank row so all deletions are PREFIX long
+        patterns, pattern_depths = [], []
+        for depth in range(MAX_TYPOS + 1):
+            for deleted in itertools.combinations(range(PREFIX), depth):
+                kept = [i for i in range(PREFIX) if i not in deleted]
+                patterns.append(kept + [PREFIX] * depth)
+                pattern_depths.append(depth)
+        patterns = np.array(patterns).T
+        pattern_depths = np.array(pattern_depths, dtype=np.int64)
+
+        chunks = []
+        for first in range(0, len(names), CHUNK):
+            codes = code_points(names[first:first + CHUNK])
+            codes = np.pad(codes, ((0, 1), (0, 0)))
+            hashes = hash_codes(codes[patterns]).astype(np.int64)
+            groups = np.arange(first, first + codes.shape[1])
+            keys = (
+                hashes << shift | groups << DEPTH_BITS
+                | pattern_depths[:, np.newaxis]
+            )
+            keys = np.sort(keys, axis=None)
+
+            # Deleting blanks past the end of a name, or one of several
+            # equal characters, leaves a string already left by fewer
+            # deletions; only the entry with the fewest is kept
+            keep = np.ones(len(keys), dtype=bool)
+            keep[1:] = keys[1:] >> DEPTH_BITS != keys[:-1] >> DEPTH_BITS
+            chunks.append(keys[keep])
+
+        keys = np.concatenate(chunks or [np.zeros(0, dtype=np.int64)])
+        del chunks
+        keys.sort()
+        self.graph.name_groups = runs
+        self.graph.name_deletions = keys
+
+
+def code_points(strings):
+    """
+    Return a PREFIX row matrix with a column of the first PREFIX code
+    points of every string, padded with zeros.
+    """
+    codes = np.array(strings, dtype=f"U{PREFIX}").view(np.uint32)
+    return codes.reshape(len(strings), PREFIX).T
+
+
+def hash_codes(codes):
+    """
+    Return the 32 bit hash of every string of code points running along
+    the first axis of `codes`: their 64 bit FNV-1a hash with both halves
+    xored. Each step hashes one code point of every string at once.
+    """
+    hashes = np.full(codes.shape[1:], FNV_OFFSET, dtype=np.uint64)
+    for row in codes:
+        hashes ^= row
+        hashes *= FNV_PRIME
+    return (hashes ^ hashes >> 32) & 0xFFFFFFFF
+
+
+def deletions(name, typos):
+    """
+    Return a dict mapping every string left by deleting up to `typos`
+    characters from `name` to the fewest characters deleted to get it.
+    """
+    variants = {name: 0}
+
+    # (string, first position it may still delete from) pairs, so each
+    # combination of deleted positions is only generated once
+    layer = [(name, 0)]
+    for depth in range(1, typos + 1):
+        layer = [
+            (variant[:i] + variant[i + 1:], i)
+            for variant, start in layer for i in range(start, len(variant))
+        ]
+        for variant, _ in layer:
+            variants.setdefault(variant, depth)
+    return variants
+
+
+def edit_distance(a, b, limit):
+    """
+    Return the Levenshtein distance between two strings,
+    or None if it exceeds `limit`.
+
+    The distances of all prefixes of `a` to a prefix of `b` are kept as
+    bit vectors of the +1/-1 steps between them (Myers' bit-parallel
+    algorithm, in Hyyro's form for whole strings), so each character
+    of `b` costs a few integer operations instead of a row of cells.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return None
+    if not a:
+        return len(b)
+
+    matches = dict()
+    for i, char in enumerate(a):
+        matches[char] = matches.get(char, 0) | 1 << i
+    mask = (1 << len(a)) - 1
+    last = 1 << (len(a) - 1)
+
+    positive, negative, distance = mask, 0, len(a)
+    for char in b:
+        match = matches.get(char, 0)
+        vertical = match | negative
+        horizontal = ((match & positive) + positive ^ positive) | match
+        up = negative | ~(horizontal | positive)
+        down = positive & horizontal
+        if up & last:
+            distance += 1
+        elif down & last:
+            distance -= 1
+        up = (up << 1 | 1) & mask
+        down = (down << 1) & mask
+        positive = down | ~(vertical | up) & mask
+        negative = up & vertical
+    return distance if distance <= limit else None
+
+
+def choose(graph, people, policy):
+    """
+    Return one person index among `people` sharing a name, following
+    `policy`, or None if the policy leaves the choice to the user.
+
+    MOST_CONNECTED picks whoever starred in the most movies, NEWEST the
+    latest birth year, with people of unknown birth year last.
+    """
+    if policy == MOST_CONNECTED:
+        offsets = graph.person_offsets
+        return max(
+            people, key=lambda person: offsets[person + 1] - offsets[person]
+        )
+    if policy == NEWEST:
+        return max(people, key=lambda person: birth_year(graph, person))
+    return None
+
+
+def birth_year(graph, person):
+    """Return the birth year of a person index, or -1 if unknown."""
+    birth = graph.person_births[person]
+    return int(birth) if birth.isdigit() else -1
@@ -0,0 +1,162 @@
+import json
+import multiprocessing
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import landmarks
+import nameindex
+import snapshot
+
+USAGE = "Usage: /path?source=NAME&target=NAME"
+
+# Graph, indexes and name options of the worker, set by `start_worker`
+graph = None
+landmark_index = None
+name_index = None
+policy = nameindex.ASK
+fuzzy = False
+
+
+def start_worker(directory, name_policy, fuzzy_names):
+    """
+    Load the graph of `directory` in a pool worker. The graph, with its
+    fuzzy name index, and the landmark index are memory-mapped, so all
+    workers share the same pages.
+    """
+    global graph, landmark_index, name_index, policy, fuzzy
+    graph = snapshot.load(directory)
+    landmark_index = landmarks.load(directory)
+    name_index = nameindex.NameIndex(graph)
+    policy, fuzzy = name_policy, fuzzy_names
+
+
+def create_pool(directory, workers=None, policy=nameindex.ASK, fuzzy=False):
+    """
+    Return a process pool whose workers answer queries over the graph
+    of `directory`. Uses one worker per core if `workers` is None.
+    Names are resolved following `policy` and `fuzzy`, as in
+    `degrees.person_id_for_name`.
+    """
+    # Build the snapshot once up front instead of once per worker
+    snapshot.load(directory)
+    return multiprocessing.Pool(
+        workers, initializer=start_worker,
+        initargs=(directory, policy, fuzzy)
+    )
+
+
+def answer(query):
+    """
+    Answer a (source name, target name) query in a worker.
+    Return a dict ready to be written as JSON.
+    """
+    if len(query) != 2:
+        return {"error": "Expected 'source<TAB>target'", "query": query}
+    source_name, target_name = query
+    result = {"source": source_name, "target": target_name}
+
+    source, error = resolve(source_name)
+    if error is None:
+        target, error = resolve(target_name)
+    if error is not None:
+        result["error"] = error
+        return result
+
+    path = graph.shortest_index_path(source, target, landmark_index)
+    if path is None:
+        result["degrees"] = None
+        result["path"] = None
+        return result
+
+    result["degrees"] = len(path)
+    result["path"] = [
+        {
+            "movie_id": graph.movie_ids[movie],
+            "title": graph.movie_titles[movie],
+            "person_id": graph.person_ids[person],
+            "name": graph.person_names[person],
+        }
+        for movie, person in path
+    ]
+    return result
+
+
+def resolve(name):
+    """
+    Return (person index, None) for a name, or (None, error message)
+    if the name is unknown or shared by several people and the name
+    policy does not pick one of them.
+    """
+    people = name_index.candidates(name, fuzzy)
+    if len(people) == 0:
+        return None, f"Person not found: {name}"
+    if len(people) > 1:
+        chosen = nameindex.choose(graph, people, policy)
+        if chosen is not None:
+            return chosen, None
+        ids = ", ".join(graph.person_ids[person] for person in people)
+        return None, f"Ambiguous name: {name} (IDs: {ids})"
+    return people[0], None
+
+
+def read_queries(lines):
+    """
+    Yield the tab separated fields of every non-blank line,
+    which `answer` expects to be a source and a target name.
+    """
+    for line in lines:
+        line = line.rstrip("\n")
+        if line.strip():
+            yield tuple(field.strip() for field in line.split("\t"))
+
+
+def run_batch(directory, source, output, workers=None,
+              policy=nameindex.ASK, fuzzy=False):
+    """
+    Answer every query read from the `source` file object and write one
+    JSON result per line to `output`, in the order the queries were read.
+    """
+    with create_pool(directory, workers, policy, fuzzy) as pool:
+        for result in pool.imap(answer, read_queries(source), chunksize=16):
+            output.write(json.dumps(result) + "\n")
+
+
+def serve(directory, port, workers=None, policy=nameindex.ASK, fuzzy=False,
+          host="127.0.0.1"):
+    """
+    Answer queries over HTTP until interrupted. A request such as
+        GET /path?source=Kevin+Bacon&target=Tom+Hanks
+    returns the same JSON object as one line of batch output.
+    Requests are handled on threads that hand queries to the pool.
+    """
+    with create_pool(directory, workers, policy, fuzzy) as pool:
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = parse_qs(url.query)
+                valid = {"source", "target"} <= set(params)
+                if url.path != "/path" or not valid:
+                    self.reply(400, {"error": USAGE})
+                    return
+                query = (params["source"][0], params["target"][0])
+                self.reply(200, pool.apply(answer, (query,)))
+
+            def reply(self, status, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        print(f"Serving on http://{host}:{server.server_port}/path")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
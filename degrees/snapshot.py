@@ -0,0 +1,171 @@
+import mmap
+import os
+import struct
+import sys
+
+import ingest
+import nameindex
+
+from graph import (
+    Graph, ARRAY_SECTIONS, NAME_INDEX_SECTIONS, STRING_SECTIONS, StringTable
+)
+
+# Name of the snapshot file written next to the CSV files
+FILENAME = "degrees.snapshot"
+
+# Bump whenever the layout of the snapshot changes
+VERSION = 2
+
+MAGIC = b"DEGREES\0"
+SOURCES = ["people.csv", "movies.csv", "stars.csv"]
+
+# Magic, version, byte order, then (size, mtime) of every source file
+HEADER = struct.Struct("=8sII" + "qq" * len(SOURCES))
+
+# Byte offset and byte length of one section
+ENTRY = struct.Struct("=qq")
+
+# Sections are padded so every array starts on an 8 byte boundary
+ALIGNMENT = 8
+
+BYTE_ORDER = 1 if sys.byteorder == "little" else 2
+
+
+def load(directory, report=None):
+    """
+    Return the graph of a data directory, memory-mapping its snapshot if
+    one is up to date with the CSV files. Otherwise parse the CSV files
+    and write a fresh snapshot for the next run.
+
+    If the CSV files were parsed and `report` is a dict, it is updated
+    with the row counts from `ingest.ingest`.
+    """
+    path = os.path.join(directory, FILENAME)
+    graph = read(path, source_stats(directory))
+    if graph is not None:
+        return graph
+
+    graph, counts = ingest.ingest(directory)
+    if report is not None:
+        report.update(counts)
+    try:
+        write(graph, path, source_stats(directory))
+    except OSError:
+        # Read-only data directories still work, just without a snapshot
+        return graph
+
+    # Map the fresh snapshot so pages are shared with later processes
+    return read(path, source_stats(directory)) or graph
+
+
+def source_stats(directory):
+    """Return a list of (size, mtime) for every source CSV file."""
+    stats = []
+    for filename in SOURCES:
+        stat = os.stat(os.path.join(directory, filename))
+        stats.append((stat.st_size, stat.st_mtime_ns))
+    return stats
+
+
+def raw_sections():
+    """
+    Return (name, typecode) of every flat buffer in a snapshot, in order.
+    Each string section is stored as its offsets and its blob.
+    """
+    raw = [(name, "i") for name in ARRAY_SECTIONS]
+    for name in STRING_SECTIONS:
+        raw.append((f"{name}_offsets", "q"))
+        raw.append((f"{name}_blob", "B"))
+    raw.extend(NAME_INDEX_SECTIONS.items())
+    return raw
+
+
+def buffers(graph):
+    """
+    Yield the buffer of every raw section of a graph, in order,
+    building its fuzzy name index first if it has none.
+    """
+    for name in ARRAY_SECTIONS:
+        yield getattr(graph, name)
+    for name in STRING_SECTIONS:
+        table = getattr(graph, name)
+        yield table.offsets
+        yield table.blob
+    if graph.name_deletions is None:
+        nameindex.NameIndex(graph).build()
+    for name in NAME_INDEX_SECTIONS:
+        yield getattr(graph, name)
+
+
+def write(graph, path, stats):
+    """
+    Write a snapshot of a graph to `path`, tagged with the stats of the
+    source files it was built from. The file is written under a temporary
+    name and moved into place so readers never see a partial snapshot.
+    The fuzzy name index is built and saved too, so processes mapping the
+    snapshot share one copy of it.
+    """
+    stats = [value for stat in stats for value in stat]
+    table_size = ENTRY.size * len(raw_sections())
+    position = align(HEADER.size + table_size)
+
+    entries, data = [], []
+    for buffer in buffers(graph):
+        view = memoryview(buffer).cast("B")
+        entries.append((position, len(view)))
+        data.append((position, view))
+        position = align(position + len(view))
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, BYTE_ORDER, *stats))
+            for entry in entries:
+                f.write(ENTRY.pack(*entry))
+            for start, view in data:
+                f.write(b"\0" * (start - f.tell()))
+                f.write(view)
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def read(path, stats):
+    """
+    Return a graph backed by a memory map of the snapshot at `path`,
+    or None if there is no snapshot or it does not match `stats`.
+    """
+    try:
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    view = memoryview(mapped)
+    if len(view) < HEADER.size:
+        return None
+    magic, version, byte_order, *saved = HEADER.unpack_from(view)
+    expected = [value for stat in stats for value in stat]
+    if (magic, version, byte_order) != (MAGIC, VERSION, BYTE_ORDER):
+        return None
+    if saved != expected:
+        return None
+
+    raw = {}
+    for i, (name, typecode) in enumerate(raw_sections()):
+        start, length = ENTRY.unpack_from(view, HEADER.size + i * ENTRY.size)
+        raw[name] = view[start:start + length].cast(typecode)
+
+    sections = {name: raw[name] for name in ARRAY_SECTIONS}
+    sections.update((name, raw[name]) for name in NAME_INDEX_SECTIONS)
+    for name in STRING_SECTIONS:
+        sections[name] = StringTable(
+            raw[f"{name}_offsets"], raw[f"{name}_blob"]
+        )
+    return Graph(sections)
+
+
+def align(position):
+    """Round `position` up to the next multiple of ALIGNMENT."""
+    return -(-position // ALIGNMENT) * ALIGNMENT
@@ -4,7 +4,9 @@ Make sure that this file is in the same directory as degrees.py!
 'Why do we fall sir? So that we can learn to pick ourselves up.'
                                         - Batman Begins (2005)
 """
-from degrees import load_data, person_id_for_name, shortest_path
+from degrees import (
+    all_shortest_paths, distance, load_data, person_id_for_name, shortest_path
+)
 
 load_data("large")
 
@@ -63,4 +65,32 @@ def test_six_degree():
 def test_eight_degree():
     source = person_id_for_name("Juliane Banse")
     target = person_id_for_name("Julian Acosta")
-    assert len(shortest_path(source, target)) == 8
\ No newline at end of file
+    assert len(shortest_path(source, target)) == 8
+
+
+def test_bidirectional_matches_breadth_first():
+    source = person_id_for_name("Emma Watson")
+    target = person_id_for_name("Jennifer Lawrence")
+    forward = shortest_path(source, target, bidirectional=False)
+    assert len(shortest_path(source, target)) == len(forward)
+
+
+def test_distance():
+    source = person_id_for_name("Juliane Banse")
+    target = person_id_for_name("Bruce Davison")
+    assert distance(source, target) == 6
+
+
+def test_fuzzy_name():
+    assert person_id_for_name("Tom Hanx", fuzzy=True) == (
+        person_id_for_name("Tom Hanks")
+    )
+
+
+def test_all_shortest_paths():
+    source = person_id_for_name("Tom Cruise")
+    target = person_id_for_name("Tom Hanks")
+    paths = list(all_shortest_paths(source, target, limit=50))
+    assert 0 < len(paths) <= 50
+    assert all(len(path) == 2 for path in paths)
+    assert len(set(map(tuple, paths))) == len(paths)
@@ -0,0 +1,279 @@
+"""
+Tests for degrees.py and the modules around it that run without the
+large dataset test.py needs: on the small dataset, and on tiny CSV
+files written to a temporary directory.
+"""
+import csv
+import io
+import json
+import os
+
+import pytest
+
+import landmarks
+import nameindex
+import service
+import snapshot
+
+from ingest import ingest
+
+SMALL = os.path.join(os.path.dirname(__file__), "small")
+
+# Every person of the small dataset can be a landmark
+SMALL_PEOPLE = 16
+
+PEOPLE = [
+    ("1", "Alice Adams", "1970"),
+    ("2", "Bob Brown", "1980"),
+    ("3", "Carol Clark", ""),
+    ("4", "Dan Davis", "1990"),
+]
+
+MOVIES = [("10", "First", "2000"), ("11", "Second", "2001")]
+
+# Alice - First - Bob - Second - Carol, and Dan in nothing
+STARS = [("1", "10"), ("2", "10"), ("2", "11"), ("3", "11")]
+
+
+def write_dataset(directory, people=PEOPLE, movies=MOVIES, stars=STARS):
+    """Write people.csv, movies.csv and stars.csv to a directory."""
+    files = {
+        "people.csv": [("id", "name", "birth")] + list(people),
+        "movies.csv": [("id", "title", "year")] + list(movies),
+        "stars.csv": [("person_id", "movie_id")] + list(stars),
+    }
+    for filename, rows in files.items():
+        with open(os.path.join(directory, filename), "w", newline="") as f:
+            csv.writer(f).writerows(rows)
+    return str(directory)
+
+
+def test_ingest_small():
+    graph, report = ingest(SMALL)
+    assert report == {
+        "people": 16, "movies": 5, "stars": 20,
+        "duplicate_people": 0, "duplicate_movies": 0,
+        "unknown_people": 0, "unknown_movies": 0, "malformed": 0,
+    }
+    bacon = graph.people_named("kevin bacon")[0]
+    hanks = graph.people_named("tom hanks")[0]
+    assert graph.person_ids[bacon] == "102"
+    assert {
+        graph.movie_titles[movie] for movie in graph.movies_of(bacon)
+    } == {"A Few Good Men", "Apollo 13"}
+    assert len(graph.shortest_index_path(bacon, hanks)) == 1
+
+
+def test_ingest_reports_skipped_rows(tmp_path):
+    directory = write_dataset(
+        tmp_path,
+        people=PEOPLE + [("1", "Alice Again", "1971"), ("5",)],
+        movies=MOVIES + [("10", "First Again", "2002"), ()],
+        stars=STARS + [("9", "10"), ("1", "99"), ("1",)],
+    )
+    graph, report = ingest(directory)
+    assert report == {
+        "people": 4, "movies": 2, "stars": 4,
+        "duplicate_people": 1, "duplicate_movies": 1,
+        "unknown_people": 1, "unknown_movies": 1, "malformed": 2,
+    }
+
+    # The first row of a repeated id is kept
+    assert graph.person_names[graph.person_index("1")] == "Alice Adams"
+    assert graph.movie_titles[graph.movie_index("10")] == "First"
+
+
+def test_ingest_in_chunks(tmp_path):
+    directory = write_dataset(tmp_path)
+    graph, report = ingest(directory)
+    chunked, chunked_report = ingest(directory, chunk_rows=1)
+    assert chunked_report == report
+    for person in range(len(graph)):
+        assert list(chunked.neighbors(person)) == list(graph.neighbors(person))
+
+
+def test_ingest_requires_columns(tmp_path):
+    directory = write_dataset(tmp_path)
+    with open(os.path.join(directory, "stars.csv"), "w") as f:
+        f.write("person,movie\n1,10\n")
+    with pytest.raises(ValueError):
+        ingest(directory)
+
+
+def test_snapshot_is_reused(tmp_path):
+    directory = write_dataset(tmp_path)
+    report = {}
+    graph = snapshot.load(directory, report)
+    assert report["stars"] == len(STARS)
+    assert os.path.exists(os.path.join(directory, snapshot.FILENAME))
+
+    report = {}
+    mapped = snapshot.load(directory, report)
+    assert report == {}
+    assert isinstance(mapped.person_offsets, memoryview)
+    assert list(mapped.person_ids) == list(graph.person_ids)
+    for person in range(len(graph)):
+        assert list(mapped.neighbors(person)) == list(graph.neighbors(person))
+
+
+def test_snapshot_rebuilt_when_size_changes(tmp_path):
+    directory = write_dataset(tmp_path)
+    snapshot.load(directory)
+    with open(os.path.join(directory, "stars.csv"), "a", newline="") as f:
+        csv.writer(f).writerow(("4", "11"))
+
+    report = {}
+    graph = snapshot.load(directory, report)
+    assert report["stars"] == len(STARS) + 1
+    dan = graph.person_index("4")
+    assert len(list(graph.neighbors(dan))) == 2
+
+
+def test_snapshot_rebuilt_when_mtime_changes(tmp_path):
+    directory = write_dataset(tmp_path)
+    snapshot.load(directory)
+    path = os.path.join(directory, "people.csv")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    report = {}
+    snapshot.load(directory, report)
+    assert report["people"] == len(PEOPLE)
+
+    report = {}
+    snapshot.load(directory, report)
+    assert report == {}
+
+
+def test_run_batch(tmp_path):
+    # A second Bob Brown, in no movies
+    directory = write_dataset(tmp_path, people=PEOPLE + [
+        ("5", "Bob Brown", "1985")
+    ])
+    queries = io.StringIO(
+        "Alice Adams\tCarol Clark\n"
+        "\n"
+        "Alice Adams\tDan Davis\n"
+        "Alice Adams\tNobody\n"
+        "Bob Brown\tAlice Adams\n"
+        "Alice Adams\n"
+        "carol clark\talice adams\n"
+    )
+    output = io.StringIO()
+    service.run_batch(directory, queries, output, workers=1)
+    results = [json.loads(line) for line in output.getvalue().splitlines()]
+
+    assert len(results) == 6
+    assert results[0] == {
+        "source": "Alice Adams", "target": "Carol Clark", "degrees": 2,
+        "path": [
+            {"movie_id": "10", "title": "First",
+             "person_id": "2", "name": "Bob Brown"},
+            {"movie_id": "11", "title": "Second",
+             "person_id": "3", "name": "Carol Clark"},
+        ],
+    }
+    assert results[1]["degrees"] is None and results[1]["path"] is None
+    assert results[2]["error"] == "Person not found: Nobody"
+    assert results[3]["error"] == "Ambiguous name: Bob Brown (IDs: 2, 5)"
+    assert results[4]["query"] == ["Alice Adams"]
+    assert results[5]["source"] == "carol clark"
+    assert results[5]["degrees"] == 2
+
+
+def test_run_batch_name_policy(tmp_path):
+    directory = write_dataset(tmp_path, people=PEOPLE + [
+        ("5", "Bob Brown", "1985")
+    ])
+    queries = io.StringIO("Alice Adams\tBob Brown\n")
+    for policy, degrees in [
+        (nameindex.MOST_CONNECTED, 1), (nameindex.NEWEST, None)
+    ]:
+        output = io.StringIO()
+        service.run_batch(directory, queries, output, 1, policy)
+        queries.seek(0)
+        assert json.loads(output.getvalue())["degrees"] == degrees
+
+
+def test_landmark_bounds():
+    graph = snapshot.load(SMALL)
+    index = landmarks.LandmarkIndex.build(graph, SMALL_PEOPLE)
+    assert len(index.landmarks) > 1
+    for source in range(len(graph)):
+        distances = landmarks.distances_from(graph, source)
+        for target in range(len(graph)):
+            distance = distances[target]
+            path = graph.shortest_index_path(source, target, index)
+            if distance == landmarks.UNREACHABLE:
+                assert path is None
+                assert graph.distance(source, target, index) is None
+                continue
+            lower, upper = index.bounds(source, target)
+            assert lower <= distance
+            assert upper is None or distance <= upper
+            assert len(path) == distance
+            assert graph.distance(source, target, index) == distance
+
+
+def test_landmark_bounds_disconnected(tmp_path):
+    directory = write_dataset(tmp_path)
+    graph = snapshot.load(directory)
+    index = landmarks.LandmarkIndex.build(graph)
+    alice, carol = graph.person_index("1"), graph.person_index("3")
+    dan = graph.person_index("4")
+    # Bob has the most movies and is one degree from both
+    assert index.landmarks[0] == graph.person_index("2")
+    assert index.bounds(alice, carol) == (0, 2)
+    assert index.bounds(alice, dan) is None
+    assert graph.shortest_index_path(alice, dan, index) is None
+
+
+def test_landmark_index_saved(tmp_path):
+    directory = write_dataset(tmp_path)
+    graph = snapshot.load(directory)
+    index = landmarks.LandmarkIndex.build(graph)
+    assert landmarks.load(directory) is None
+
+    index.save(
+        os.path.join(directory, landmarks.FILENAME),
+        snapshot.source_stats(directory)
+    )
+    saved = landmarks.load(directory)
+    assert list(saved.landmarks) == list(index.landmarks)
+    for person in range(len(graph)):
+        assert saved.profile(person) == index.profile(person)
+
+    with open(os.path.join(directory, "stars.csv"), "a", newline="") as f:
+        csv.writer(f).writerow(("4", "11"))
+    assert landmarks.load(directory) is None
+
+
+def test_fuzzy_names():
+    graph, _ = ingest(SMALL)
+    index = nameindex.NameIndex(graph)
+    hanks = graph.people_named("tom hanks")
+    assert index.candidates("Tom Hanx", fuzzy=True) == hanks
+    assert index.candidates("Tom Hanx") == []
+    assert index.fuzzy("tomm hnks") == [(2, hanks[0])]
+    assert index.fuzzy("Tom Hanks", max_typos=0) == [(0, hanks[0])]
+    assert index.fuzzy("Zzzzzzzzz") == []
+
+    # Names too short for typos only match exactly
+    assert index.fuzzy("Tom") == []
+
+
+def test_fuzzy_index_in_snapshot(tmp_path):
+    directory = write_dataset(tmp_path, people=PEOPLE + [
+        ("5", "Alice Adas", "1985"), ("6", "Ålice Adams", "1990")
+    ])
+    built = snapshot.load(directory)
+    assert built.name_deletions is not None
+
+    mapped = snapshot.load(directory)
+    assert isinstance(mapped.name_deletions, memoryview)
+    assert list(mapped.name_deletions) == list(built.name_deletions)
+    for graph in [built, mapped]:
+        assert nameindex.NameIndex(graph).fuzzy("alice adamz") == [
+            (1, graph.person_index("1")), (2, graph.person_index("5")),
+            (2, graph.person_index("6")),
+        ]
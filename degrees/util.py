@@ -1,3 +1,6 @@
+from collections import deque
+
+
 class Node():
     def __init__(self, state, parent, action):
         self.state = state
@@ -5,7 +8,7 @@ class Node():
         self.action = action
 
     def __hash__(self):
-        parent_state = self.parent.state if not self.parent == None else None 
+        parent_state = self.parent.state if not self.parent == None else None
 
         return hash((self.state, parent_state, self.action))
 
@@ -15,13 +18,16 @@ class Node():
 
 class StackFrontier():
     def __init__(self):
-        self.frontier = []
+        self.frontier = deque()
+        # Maps each state to the number of nodes holding it in the frontier
+        self.states = dict()
 
     def add(self, node):
         self.frontier.append(node)
+        self.states[node.state] = self.states.get(node.state, 0) + 1
 
     def contains_state(self, state):
-        return any(node.state == state for node in self.frontier)
+        return state in self.states
 
     def empty(self):
         return len(self.frontier) == 0
@@ -30,10 +36,21 @@ class StackFrontier():
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[-1]
-            self.frontier = self.frontier[:-1]
+            node = self.frontier.pop()
+            self.discard_state(node.state)
             return node
 
+    def discard_state(self, state):
+        """
+        Forget one node holding `state`, dropping it from the
+        index once no node in the frontier holds it anymore
+        """
+        count = self.states[state] - 1
+        if count == 0:
+            del self.states[state]
+        else:
+            self.states[state] = count
+
 
 class QueueFrontier(StackFrontier):
 
@@ -41,6 +58,6 @@ class QueueFrontier(StackFrontier):
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[0]
-            self.frontier = self.frontier[1:]
+            node = self.frontier.popleft()
+            self.discard_state(node.state)
             return node
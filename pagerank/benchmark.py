@@ -0,0 +1,212 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+
+import solvers
+
+from crawler import crawl_edges, list_pages
+from graph import LinkGraph, burn_in_steps, sample_visits
+
+# Corpus sizes benchmarked by default
+SIZES = [1000, 10000, 100000]
+
+# Tolerance of the reference ranks every estimate is compared against
+REFERENCE_TOLERANCE = 1e-12
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark pagerank on synthetic HTML corpora",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=SIZES,
+        help="numbers of pages of the corpora to benchmark"
+    )
+    parser.add_argument(
+        "--links", type=float, default=8, help="mean number of links per page"
+    )
+    parser.add_argument(
+        "--dangling", type=float, default=0.1,
+        help="share of pages without links"
+    )
+    parser.add_argument(
+        "--exponent", type=float, default=1.0,
+        help="Zipf exponent of how links are spread over target pages"
+    )
+    parser.add_argument("--damping", type=float, default=0.85)
+    parser.add_argument(
+        "--samples", type=int, nargs="+", default=[10000, 100000, 1000000],
+        help="sample counts to time sampling at"
+    )
+    parser.add_argument(
+        "--walkers", type=int, default=1,
+        help="surfers sampling together; 1 is what pagerank.py runs"
+    )
+    parser.add_argument(
+        "--burn-in", type=int,
+        help="uncounted steps per surfer (default: none for one surfer, "
+             "graph.burn_in_steps for several)"
+    )
+    parser.add_argument("--tolerance", type=float, default=1e-6)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--directory",
+        help="write the corpora under here and keep them (default: temporary)"
+    )
+    parser.add_argument(
+        "--output", help="write JSON results here instead of stdout"
+    )
+    args = parser.parse_args()
+
+    if args.burn_in is None:
+        args.burn_in = burn_in_steps(args.damping) if args.walkers > 1 else 0
+    results = {
+        "commit": commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "parameters": {
+            "links": args.links, "dangling": args.dangling,
+            "exponent": args.exponent, "damping": args.damping,
+            "walkers": args.walkers, "burn_in": args.burn_in,
+            "tolerance": args.tolerance,
+            "seed": args.seed,
+        },
+        "corpora": [],
+    }
+    for size in args.sizes:
+        if args.directory:
+            directory = os.path.join(args.directory, f"corpus-{size}")
+            os.makedirs(directory, exist_ok=True)
+            results["corpora"].append(run(args, size, directory))
+        else:
+            with tempfile.TemporaryDirectory() as directory:
+                results["corpora"].append(run(args, size, directory))
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+def run(args, size, directory):
+    """
+    Generate a corpus of `size` pages in `directory`, time crawling,
+    sampling and every solver over it and return the results as a dict.
+    Errors are L1 distances from ranks solved to REFERENCE_TOLERANCE.
+    """
+    rng = random.Random(args.seed)
+    generate(directory, size, args.links, args.dangling, args.exponent, rng)
+    results = {"pages": size}
+
+    start = time.perf_counter()
+    graph = LinkGraph.from_edges(list_pages(directory), crawl_edges(directory))
+    elapsed = time.perf_counter() - start
+    results["links"] = len(graph.sources)
+    results["crawl"] = {"seconds": elapsed, "pages_per_second": size / elapsed}
+
+    reference = solvers.solve(
+        graph, args.damping, REFERENCE_TOLERANCE, max_iterations=10000
+    ).ranks
+
+    results["sampling"] = []
+    generator = np.random.default_rng(args.seed)
+    for n in args.samples:
+        start = time.perf_counter()
+        visits = sample_visits(
+            graph, args.damping, n, generator, args.walkers, args.burn_in
+        )
+        elapsed = time.perf_counter() - start
+        results["sampling"].append({
+            "samples": n,
+            "seconds": elapsed,
+            "samples_per_second": n / elapsed,
+            "l1_error": float(np.abs(visits / n - reference).sum()),
+        })
+
+    results["iteration"] = []
+    for method in solvers.METHODS:
+        solution = solvers.solve(graph, args.damping, args.tolerance, method)
+        results["iteration"].append({
+            "method": method,
+            "iterations": solution.iterations,
+            "converged": solution.converged,
+            "seconds": solution.seconds,
+            "seconds_per_sweep": solution.seconds / solution.iterations,
+            "l1_error": float(np.abs(solution.ranks - reference).sum()),
+        })
+    return results
+
+
+def generate(directory, size, links, dangling, exponent, rng):
+    """
+    Write `size` HTML pages named 0.html, 1.html, ... to a directory.
+
+    A `dangling` share of the pages have no links. The others draw an
+    exponentially distributed number of links, `links` per page on
+    average over all pages, with targets picked by Zipf-like weights of
+    `exponent`: a few pages receive most links, as on the web. Drawing
+    the same target twice makes one link, so the final mean is lower.
+    """
+    cumulative = list(itertools.accumulate(
+        1 / (rank + 1) ** exponent for rank in range(size)
+    ))
+    population = range(size)
+    linking = links / (1 - dangling) if dangling < 1 else 0
+
+    for page in range(size):
+        targets = set()
+        if rng.random() >= dangling:
+            count = max(1, round(rng.expovariate(1 / linking)))
+            targets = set(
+                rng.choices(population, cum_weights=cumulative, k=count)
+            )
+            targets.discard(page)
+        items = "".join(
+            f'            <li><a href="{target}.html">{target}</a></li>\n'
+            for target in sorted(targets)
+        )
+        with open(os.path.join(directory, f"{page}.html"), "w") as f:
+            f.write(PAGE.format(page=page, items=items))
+
+
+PAGE = """<!DOCTYPE html>
+<html lang="en">
+    <head>
+        <title>{page}</title>
+    </head>
+    <body>
+        <h1>{page}</h1>
+
+        <div>Links:</div>
+        <ul>
+{items}        </ul>
+    </body>
+</html>
+"""
+
+
+def commit():
+    """Return the current git commit hash, or None outside a git tree."""
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip()
+
+
+if __name__ == "__main__":
+    main()
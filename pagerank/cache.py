@@ -0,0 +1,214 @@
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+
+from crawler import crawl_edges, list_pages
+from graph import LinkGraph
+
+# Directory inside a corpus where its graphs and ranks are cached
+DIRECTORY = ".pagerank"
+
+# Bump whenever the layout of the cache files changes
+VERSION = 1
+
+# Page stats remembered in keys.json, oldest forgotten first. Graphs and
+# ranks are only kept for the corpus contents still named there
+MAX_KEYS = 8
+
+# Rank vectors kept for one corpus, oldest dropped first
+MAX_RANKS = 32
+
+# Errors of np.load on a missing, empty, truncated or corrupt cache file.
+# zipfile raises NotImplementedError for garbled compression fields
+UNREADABLE = (
+    OSError, ValueError, EOFError, zipfile.BadZipFile, NotImplementedError
+)
+
+
+def load_graph(directory, workers=None):
+    """
+    Return (graph, key) for a corpus directory, where `key` is the
+    content hash of its pages.
+
+    A graph cached under the same key is loaded without crawling.
+    Otherwise the corpus is crawled and its graph cached for next time.
+    """
+    key = corpus_key(directory)
+    path = os.path.join(directory, DIRECTORY, f"{key}.graph.npz")
+    graph = read_graph(path)
+    if graph is not None:
+        return graph, key
+
+    graph = LinkGraph.from_edges(
+        list_pages(directory), crawl_edges(directory, workers)
+    )
+    try:
+        write_graph(graph, path)
+    except OSError:
+        # Read-only corpora still work, just without a cache
+        pass
+    return graph, key
+
+
+def load_ranks(directory, key, name, solve):
+    """
+    Return the rank vector cached as `name` for the corpus with content
+    hash `key`. If there is none, call `solve()` and cache its result.
+    """
+    path = os.path.join(directory, DIRECTORY, f"{key}.ranks.npz")
+    entries = read_entries(path)
+    if name in entries:
+        return entries[name]
+
+    entries[name] = solve()
+    for stale in list(entries)[:-MAX_RANKS]:
+        del entries[stale]
+    try:
+        save(path, entries)
+    except OSError:
+        pass
+    return entries[name]
+
+
+def rank_name(method, **parameters):
+    """
+    Return the cache name of a rank vector, such as
+    "iterate damping=0.85 tolerance=1e-06".
+    """
+    settings = " ".join(
+        f"{name}={value!r}" for name, value in sorted(parameters.items())
+    )
+    return f"{method} {settings}"
+
+
+def corpus_key(directory):
+    """
+    Return the content hash of a corpus directory. Hashes are remembered
+    by the size and mtime of every page, as `degrees` does for its
+    snapshot, so an unchanged corpus is not read again. Only the last
+    MAX_KEYS are remembered, and the cache files of contents no longer
+    remembered are removed.
+    """
+    path = os.path.join(directory, DIRECTORY, "keys.json")
+    stats = stats_hash(directory)
+    try:
+        with open(path) as f:
+            keys = json.load(f)
+    except (OSError, ValueError):
+        keys = {}
+    if stats in keys:
+        return keys[stats]
+
+    key = corpus_hash(directory)
+    keys[stats] = key
+    for stale in list(keys)[:-MAX_KEYS]:
+        del keys[stale]
+    try:
+        write_file(path, lambda f: f.write(json.dumps(keys).encode()))
+        prune(os.path.dirname(path), set(keys.values()))
+    except OSError:
+        pass
+    return key
+
+
+def stats_hash(directory):
+    """Return a hex digest of the name, size and mtime of every page."""
+    digest = hashlib.blake2b(digest_size=16)
+    entries = sorted(
+        (entry.name, entry.stat()) for entry in os.scandir(directory)
+        if entry.name.endswith(".html") and entry.is_file()
+    )
+    for page, stat in entries:
+        digest.update(f"{page}\0{stat.st_size}\0{stat.st_mtime_ns}\0".encode())
+    return digest.hexdigest()
+
+
+def corpus_hash(directory):
+    """
+    Return a hex digest of the name and contents of every HTML page
+    in a directory, so any edit, addition or removal changes it.
+    """
+    digest = hashlib.blake2b(f"pagerank {VERSION}".encode(), digest_size=16)
+    for page in list_pages(directory):
+        with open(os.path.join(directory, page), "rb") as f:
+            contents = f.read()
+        digest.update(f"{page}\0{len(contents)}\0".encode())
+        digest.update(contents)
+    return digest.hexdigest()
+
+
+def read_graph(path):
+    """
+    Return the graph stored in a cache file,
+    or None if it is missing or unreadable.
+    """
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            pages = data["pages"].tolist()
+            offsets = data["offsets"]
+            targets = data["targets"]
+    except UNREADABLE + (KeyError,):
+        return None
+    sources = np.repeat(np.arange(len(pages)), np.diff(offsets))
+    return LinkGraph(pages, sources, targets)
+
+
+def write_graph(graph, path):
+    """
+    Store a graph as its page names and CSR links: the links of page i
+    are targets[offsets[i]:offsets[i + 1]].
+    """
+    save(path, {
+        "pages": np.array(graph.pages, dtype=str),
+        "offsets": graph.out_offsets,
+        "targets": graph.out_targets,
+    })
+
+
+def read_entries(path):
+    """Return a dict of the arrays in a ranks file, empty if unreadable."""
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            return {name: data[name] for name in data.files}
+    except UNREADABLE:
+        return {}
+
+
+def prune(directory, keys):
+    """
+    Remove the cached graphs and ranks in a cache directory
+    whose content hash is not in `keys`.
+    """
+    for entry in os.scandir(directory):
+        key, _, kind = entry.name.partition(".")
+        if kind in ("graph.npz", "ranks.npz") and key not in keys:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                # Already pruned by a concurrent run
+                pass
+
+
+def save(path, arrays):
+    """Write arrays to an .npz file through `write_file`."""
+    write_file(path, lambda f: np.savez(f, **arrays))
+
+
+def write_file(path, write):
+    """
+    Call `write` with a temporary file next to `path`, then move it
+    over `path`, so readers never see a partly written cache.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
@@ -0,0 +1,145 @@
+import argparse
+import multiprocessing
+import os
+
+from html.parser import HTMLParser
+
+# Bytes of a file fed to the HTML tokenizer at a time
+READ_SIZE = 65536
+
+# Fewest files worth starting a process pool for
+POOL_MIN_FILES = 256
+
+# Files handed to a pool worker per task
+CHUNK_FILES = 64
+
+# Pages of the corpus in the worker process, set by `start_worker`
+corpus_pages = None
+
+
+class LinkParser(HTMLParser):
+    """
+    Incremental HTML tokenizer that collects the href of every <a> tag.
+    Text can be fed in pieces, so a page never has to be read whole.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.links = set()
+
+    def handle_starttag(self, tag, attrs):
+        if tag != "a":
+            return
+        for name, value in attrs:
+            if name == "href" and value is not None:
+                self.links.add(value)
+
+
+def list_pages(directory):
+    """Return the sorted names of the HTML pages in a directory."""
+    return sorted(
+        entry.name for entry in os.scandir(directory)
+        if entry.name.endswith(".html") and entry.is_file()
+    )
+
+
+def page_links(path):
+    """Return the set of hrefs of <a> tags in an HTML file."""
+    parser = LinkParser()
+    with open(path) as f:
+        while True:
+            text = f.read(READ_SIZE)
+            if not text:
+                break
+            parser.feed(text)
+    parser.close()
+    return parser.links
+
+
+def start_worker(pages):
+    """Keep the corpus pages in a pool worker to filter links against."""
+    global corpus_pages
+    corpus_pages = pages
+
+
+def parse_page(task):
+    """
+    Parse one page from a (directory, filename) task and return
+    (filename, links), keeping only links to other corpus pages.
+    """
+    directory, filename = task
+    links = page_links(os.path.join(directory, filename))
+    return filename, sorted(
+        link for link in links if link in corpus_pages and link != filename
+    )
+
+
+def crawl_edges(directory, workers=None):
+    """
+    Yield a (page, link) pair for every link between two different pages
+    of a directory of HTML pages.
+
+    Every page is parsed by its own incremental tokenizer, in a pool of
+    `workers` processes (one per CPU if None) for large corpora, and its
+    edges are yielded as soon as it is done, in no particular page
+    order. The page names are known up front from the directory, so
+    links are filtered as they are found, not after the whole crawl.
+    """
+    pages = set(list_pages(directory))
+    tasks = [(directory, filename) for filename in sorted(pages)]
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(tasks) < POOL_MIN_FILES:
+        start_worker(pages)
+        for page, links in map(parse_page, tasks):
+            for link in links:
+                yield page, link
+        return
+
+    with multiprocessing.Pool(
+        workers, initializer=start_worker, initargs=(pages,)
+    ) as pool:
+        for page, links in pool.imap_unordered(
+            parse_page, tasks, chunksize=CHUNK_FILES
+        ):
+            for link in links:
+                yield page, link
+
+
+def spill_edges(edges, path):
+    """
+    Write (page, link) pairs to a file, one tab-separated pair per line,
+    and return the number written.
+    """
+    count = 0
+    with open(path, "w") as f:
+        for page, link in edges:
+            f.write(f"{page}\t{link}\n")
+            count += 1
+    return count
+
+
+def read_edges(path):
+    """Yield the (page, link) pairs of a file written by `spill_edges`."""
+    with open(path) as f:
+        for line in f:
+            page, link = line.rstrip("\n").split("\t")
+            yield page, link
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Write the links between the pages of a corpus to a file"
+    )
+    parser.add_argument("directory", help="directory of HTML pages")
+    parser.add_argument("output", help="file to write page<TAB>link lines to")
+    parser.add_argument(
+        "--workers", type=int, help="number of parser processes"
+    )
+    args = parser.parse_args()
+    count = spill_edges(crawl_edges(args.directory, args.workers), args.output)
+    print(f"Wrote {count} links")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+import numpy as np
+
+from graph import LinkGraph
+
+# Share of active pages above which a round sweeps every link at once
+DENSE_FRACTION = 0.1
+
+
+def apply_changes(graph, added_pages=(), removed_pages=(),
+                  added_links=(), removed_links=()):
+    """
+    Return (new graph, moved, edited) after adding or removing pages and
+    links of a graph.
+
+    Links are (page, link) pairs. Removing a page also removes every link
+    to it, and, as in `crawl`, only links between pages of the graph and
+    not from a page to itself are kept. Old pages keep their order and
+    new pages come after them. `moved` holds the new index of every old
+    page, -1 if it was removed, and `edited` the new indices of pages
+    whose links changed.
+
+    Only the links of edited pages are rebuilt in Python. The CSR arrays
+    of all other pages are moved over as whole arrays.
+    """
+    size = len(graph)
+    removed = np.zeros(size, dtype=bool)
+    for page in removed_pages:
+        if page in graph.index:
+            removed[graph.index[page]] = True
+    new_pages = [
+        page for page in dict.fromkeys(added_pages)
+        if page not in graph.index or removed[graph.index[page]]
+    ]
+    moved = np.cumsum(~removed) - 1
+    moved[removed] = -1
+
+    if removed.any():
+        pages = [page for page, gone in zip(graph.pages, removed) if not gone]
+        pages += new_pages
+        index = dict(zip(pages, range(len(pages))))
+    elif new_pages:
+        pages = graph.pages + new_pages
+        index = dict(graph.index)
+        index.update((page, size + i) for i, page in enumerate(new_pages))
+    else:
+        pages, index = graph.pages, graph.index
+
+    # New link sets of edited pages by new index, starting from their old
+    # links without those to removed pages
+    links = {}
+
+    def edit(page):
+        source = index[page]
+        if source not in links:
+            links[source] = set()
+            old = graph.index.get(page)
+            if old is not None and not removed[old]:
+                start, end = graph.out_offsets[old:old + 2]
+                targets = moved[graph.out_targets[start:end]]
+                links[source] = set(targets[targets >= 0].tolist())
+        return links[source]
+
+    if removed.any():
+        linking = np.unique(graph.sources[removed[graph.targets]])
+        for source in linking[~removed[linking]].tolist():
+            edit(graph.pages[source])
+    for page, link in removed_links:
+        if page in index and link in index:
+            edit(page).discard(index[link])
+    for page, link in added_links:
+        if page in index and link in index and link != page:
+            edit(page).add(index[link])
+
+    links = {
+        source: np.array(sorted(link_set), dtype=np.int64)
+        for source, link_set in sorted(links.items())
+    }
+    edited = np.fromiter(links, dtype=np.int64, count=len(links))
+
+    # Old index of every page kept, and of the pages whose links are
+    # rebuilt mapped to their new index, None if removed
+    kept = np.flatnonzero(~removed)
+    rebuilt = dict.fromkeys(np.flatnonzero(removed).tolist())
+    rebuilt.update(
+        (int(kept[source]), source) for source in links if source < len(kept)
+    )
+
+    # Runs of links between rebuilt pages are copied whole, renumbered
+    # only if pages were removed
+    offsets, pieces, start = graph.out_offsets, [], 0
+    for old in sorted(rebuilt) + [size]:
+        run = graph.out_targets[start:offsets[old]]
+        pieces.append(moved[run] if len(kept) < size else run)
+        if rebuilt.get(old) is not None:
+            pieces.append(links[rebuilt[old]])
+        start = offsets[min(old + 1, size)]
+    pieces.extend(
+        link_array for source, link_array in links.items()
+        if source >= len(kept)
+    )
+
+    degree = np.zeros(len(pages), dtype=np.int64)
+    degree[:len(kept)] = graph.out_degree[kept]
+    degree[edited] = [len(link_array) for link_array in links.values()]
+    offsets = np.concatenate(([0], np.cumsum(degree)))
+    targets = np.concatenate(pieces)
+
+    new_graph = LinkGraph.from_csr(pages, offsets, targets, index)
+    return new_graph, moved, edited
+
+
+def update_pagerank(graph, ranks, damping_factor, tolerance=1e-6,
+                    added_pages=(), removed_pages=(),
+                    added_links=(), removed_links=()):
+    """
+    Return (new graph, new ranks) after applying changes to a graph whose
+    PageRank vector `ranks` was already computed. Both rank vectors are
+    indexed like the pages of their graph.
+
+    The old ranks are the starting point, with new pages given 1/N and
+    the whole vector rescaled to sum to 1. Since the old ranks solved the
+    old graph, the residual of that guess only comes from the links of
+    edited pages, plus a uniform term if the number of pages or the rank
+    on pages without links changed. It is found from those alone and then
+    propagated, push-style (see `push`). Small edits leave most residuals
+    near zero, so pushes stay around the edit and far fewer rounds are
+    needed than when starting from uniform ranks.
+    """
+    new_graph, moved, edited = apply_changes(
+        graph, added_pages, removed_pages, added_links, removed_links
+    )
+    size, new_size = len(graph), len(new_graph)
+
+    # Old index of every page kept, in new order
+    kept = np.flatnonzero(moved >= 0)
+    guess = np.full(new_size, 1 / new_size)
+    guess[:len(kept)] = ranks[kept]
+    scale = 1 / guess.sum()
+    guess *= scale
+
+    # Rank carried by the links of edited pages after and before the
+    # changes, counting removed pages as edited
+    old_edited = np.concatenate((
+        np.flatnonzero(moved < 0), kept[edited[edited < len(kept)]]
+    ))
+    change = (
+        spread(new_graph, edited, guess[edited], new_size)
+        - spread(graph, old_edited, scale * ranks[old_edited], new_size, moved)
+    )
+
+    # Rank arriving at every page by a jump or from pages without links
+    old_base = (
+        damping_factor * ranks[graph.dangling].sum() + 1 - damping_factor
+    ) / size
+    new_base = (
+        damping_factor * guess[new_graph.dangling].sum() + 1 - damping_factor
+    ) / new_size
+
+    residual = damping_factor * change + new_base
+    residual[:len(kept)] -= scale * old_base
+    residual[len(kept):] -= guess[len(kept):]
+    new_ranks = push(new_graph, guess, damping_factor, tolerance, residual)
+    return new_graph, new_ranks
+
+
+def push(graph, ranks, damping_factor, tolerance, residual=None):
+    """
+    Return ranks refined from a starting guess by pushing residuals
+    until none is above tolerance / N. The residual of the guess is
+    found by a step over every link unless given.
+
+    Every round, all pages whose residual is above that threshold push at
+    once: each adds its residual to its rank and hands the damped share
+    to the pages it links to, or to every page if it has no links. While
+    few pages are active, only their links are gathered from the CSR
+    arrays; once more than DENSE_FRACTION of the pages are, the round is
+    a plain sweep over every link instead.
+    """
+    size = len(graph)
+    ranks = ranks.copy()
+    threshold = tolerance / size
+    if residual is None:
+        residual = graph.step(ranks, damping_factor) - ranks
+    else:
+        residual = residual.copy()
+
+    while True:
+        active = np.flatnonzero(np.abs(residual) > threshold)
+        if len(active) == 0:
+            break
+
+        if len(active) > DENSE_FRACTION * size:
+            ranks += residual
+            shares = np.bincount(
+                graph.targets, weights=residual[graph.sources] * graph.weights,
+                minlength=size
+            )
+            dangling = residual[graph.dangling].sum()
+            residual = damping_factor * (shares + dangling / size)
+            continue
+
+        amounts = residual[active]
+        ranks[active] += amounts
+        residual[active] = 0
+        residual += damping_factor * spread(graph, active, amounts, size)
+        dangling = amounts[graph.dangling[active]].sum()
+        if dangling:
+            residual += damping_factor * dangling / size
+
+    return ranks
+
+
+def spread(graph, pages, amounts, size, moved=None):
+    """
+    Return an array of `size` totals of what the given page indices hand
+    along their links, each splitting its amount evenly over its links.
+    Pages without links hand on nothing. Targets are renumbered by
+    `moved`, if given, and those it maps to -1 dropped.
+    """
+    counts = graph.out_degree[pages]
+    firsts = np.cumsum(counts) - counts
+    links = (
+        np.repeat(graph.out_offsets[pages] - firsts, counts)
+        + np.arange(counts.sum())
+    )
+    shares = np.repeat(amounts / np.maximum(counts, 1), counts)
+    targets = graph.out_targets[links]
+    if moved is not None:
+        targets = moved[targets]
+        shares = shares[targets >= 0]
+        targets = targets[targets >= 0]
+    return np.bincount(targets, weights=shares, minlength=size)
@@ -1,50 +1,99 @@
-import os
-import random
-import re
-import sys
+import argparse
+
+import numpy as np
+
+import cache
+import solvers
+
+from crawler import crawl_edges, list_pages
+from graph import LinkGraph, sample_visits
 
 DAMPING = 0.85
 SAMPLES = 10000
+TOLERANCE = 1e-6
 
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
-    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
-    print(f"PageRank Results from Sampling (n = {SAMPLES})")
-    for page in sorted(ranks):
-        print(f"  {page}: {ranks[page]:.4f}")
-    ranks = iterate_pagerank(corpus, DAMPING)
+    parser = argparse.ArgumentParser(
+        description="Rank the pages of a corpus by sampling and iteration"
+    )
+    parser.add_argument("corpus", help="directory of HTML pages")
+    parser.add_argument("--damping", type=float, default=DAMPING)
+    parser.add_argument("--samples", type=int, default=SAMPLES)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument(
+        "--solver", choices=list(solvers.METHODS), default="jacobi",
+        help="method used for the iteration estimate"
+    )
+    parser.add_argument(
+        "--seed", type=int,
+        help="seed for sampling; only seeded samples are cached"
+    )
+    parser.add_argument(
+        "--workers", type=int, help="number of processes crawling the corpus"
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help=f"crawl and solve without reading or writing {cache.DIRECTORY}"
+    )
+    args = parser.parse_args()
+
+    if args.no_cache:
+        graph = LinkGraph.from_corpus(crawl(args.corpus, args.workers))
+    else:
+        graph, key = cache.load_graph(args.corpus, args.workers)
+
+    def sample():
+        rng = np.random.default_rng(args.seed)
+        visits = sample_visits(graph, args.damping, args.samples, rng)
+        return visits / args.samples
+
+    def iterate():
+        solution = solvers.solve(
+            graph, args.damping, args.tolerance, args.solver
+        )
+        return solution.ranks
+
+    if args.no_cache or args.seed is None:
+        ranks = sample()
+    else:
+        name = cache.rank_name(
+            "sample", damping=args.damping, samples=args.samples,
+            seed=args.seed
+        )
+        ranks = cache.load_ranks(args.corpus, key, name, sample)
+    print(f"PageRank Results from Sampling (n = {args.samples})")
+    print_ranks(graph.to_dict(ranks))
+
+    if args.no_cache:
+        ranks = iterate()
+    else:
+        name = cache.rank_name(
+            "iterate", damping=args.damping, tolerance=args.tolerance,
+            solver=args.solver
+        )
+        ranks = cache.load_ranks(args.corpus, key, name, iterate)
     print(f"PageRank Results from Iteration")
+    print_ranks(graph.to_dict(ranks))
+
+
+def print_ranks(ranks):
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
 
 
-def crawl(directory):
+def crawl(directory, workers=None):
     """
     Parse a directory of HTML pages and check for links to other pages.
     Return a dictionary where each key is a page, and values are
     a list of all other pages in the corpus that are linked to by the page.
-    """
-    pages = dict()
-
-    # Extract all links from HTML files
-    for filename in os.listdir(directory):
-        if not filename.endswith(".html"):
-            continue
-        with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
-
-    # Only include links to other pages in the corpus
-    for filename in pages:
-        pages[filename] = set(
-            link for link in pages[filename]
-            if link in pages
-        )
 
+    Pages are parsed concurrently by `crawler.crawl_edges`, with
+    `workers` processes for large corpora.
+    """
+    pages = {page: set() for page in list_pages(directory)}
+    for page, link in crawl_edges(directory, workers):
+        pages[page].add(link)
     return pages
 
 
@@ -77,7 +126,8 @@ def transition_model(corpus, page, damping_factor):
     return probability_distribution
 
 
-def sample_pagerank(corpus, damping_factor, n):
+def sample_pagerank(corpus, damping_factor, n, seed=None, walkers=1,
+                    burn_in=None):
     """
     Return PageRank values for each page by sampling `n` pages
     according to transition model, starting with a page at random.
@@ -85,29 +135,25 @@ def sample_pagerank(corpus, damping_factor, n):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
-    """
-
-    # Initialize pagerank dict with all the pages in corpus
-    page_rank = dict()
-    for page in corpus:
-        page_rank[page] = 0
-
-    # First randomly choose a page
-    curr_page = random.choice(list(corpus.keys()))
-    
-    # Iterate n times
-    for i in range(n):
-        # Add to pagerank dict for given page
-        page_rank[curr_page] += (1 / n)
-        
-        # Based on the transition model, "go" to next page
-        distribution = transition_model(corpus, curr_page, damping_factor)
-        curr_page = random.choices(list(distribution.keys()), distribution.values())[0]
 
-    return page_rank
+    Each step draws whether to follow a link or jump, then one uniform
+    index, so it costs O(1) rather than building the transition model.
+    Several `walkers` are advanced together as one vectorized batch, and
+    a single one by a plain Python loop (see `graph.surf`), with random
+    numbers from a NumPy Generator seeded by `seed`. Each
+    takes `burn_in` uncounted steps first; by default none for a single
+    surfer and `graph.burn_in_steps` for several (see `sample_visits`).
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    rng = np.random.default_rng(seed)
+    visits = sample_visits(
+        graph, damping_factor, n, rng, walkers, burn_in
+    )
+    return graph.to_dict(visits / n)
 
 
-def iterate_pagerank(corpus, damping_factor):
+def iterate_pagerank(corpus, damping_factor, tolerance=TOLERANCE,
+                     method="jacobi"):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
@@ -115,53 +161,17 @@ def iterate_pagerank(corpus, damping_factor):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
-    """
 
-    # Initialize pagerank dict with all pages with equal probability
-    total_number, pagerank = len(corpus), dict()
-    for page in corpus:
-        pagerank[page] = 1 / total_number
-
-    # Run iterative algorithm to determine pagerank
-    change, random_surfer = True, (1 - damping_factor) / total_number
-    while change:
-        # Set change to false for each round
-        change = False
-        
-        for page in corpus:
-            link_surfer = 0
-
-            # For all pages that contains link to page
-            for page_linker in links_to_page(corpus, page):
-                number_of_links = len(corpus[page_linker])
-                
-                # If the page has no link, interpret as having link to ALL pages
-                if number_of_links == 0:
-                    number_of_links = total_number
-                link_surfer += (pagerank[page_linker] / number_of_links)
-            
-            # Calculate new rank
-            new_rank = random_surfer + damping_factor * link_surfer
-
-            # If new rank differs from current by more than 0.001, let loop run once more
-            if abs(pagerank[page] - new_rank) > 0.001:
-                change = True
-            
-            # Change pagerank
-            pagerank[page] = new_rank
-
-    return pagerank
-
-
-def links_to_page(corpus, page):
-    """
-    Return list of pages in the corpus that contains links to given page
+    The corpus is turned into a sparse transition structure once, and
+    the ranks are swept by `method`, one of `solvers.METHODS`, until
+    the L1 change of a sweep is below `tolerance`. The default is power
+    iteration (Jacobi), where every page is updated from the previous
+    sweep. A page with no links is interpreted as having one link to
+    every page in the corpus.
     """
-    answer = []
-    for webpage in corpus:
-        if page in corpus[webpage] or len(corpus[webpage]) == 0:
-            answer.append(webpage)
-    return answer
+    graph = LinkGraph.from_corpus(corpus)
+    solution = solvers.solve(graph, damping_factor, tolerance, method)
+    return graph.to_dict(solution.ranks)
 
 
 if __name__ == "__main__":
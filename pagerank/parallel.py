@@ -0,0 +1,94 @@
+import multiprocessing
+import os
+
+from statistics import NormalDist
+
+import numpy as np
+
+from graph import LinkGraph, sample_visits
+
+# Samples drawn by one batch, and the surfers drawing them together
+BATCH_SAMPLES = 100000
+BATCH_WALKERS = 1000
+
+# Fewest batches used to estimate a confidence interval
+MIN_BATCHES = 4
+
+# Batches drawn at most before giving up on the requested error
+MAX_BATCHES = 1000
+
+# Graph of the worker process, set by `start_worker`
+graph = None
+
+
+def start_worker(link_graph):
+    """Keep the graph in a pool worker so batches only send seeds."""
+    global graph
+    graph = link_graph
+
+
+def run_batch(task):
+    """
+    Draw one batch of samples in a worker from a (damping factor, seed)
+    task and return the fraction of samples spent on each page.
+    """
+    damping_factor, seed = task
+    rng = np.random.default_rng(seed)
+    visits = sample_visits(
+        graph, damping_factor, BATCH_SAMPLES, rng, BATCH_WALKERS
+    )
+    return visits / BATCH_SAMPLES
+
+
+def parallel_sample_pagerank(corpus, damping_factor, error=0.001,
+                             confidence=0.95, workers=None, seed=None):
+    """
+    Return (ranks, intervals) estimated by independent batches of random
+    surfers spread over a process pool.
+
+    `ranks` maps each page to the mean of the batch estimates and
+    `intervals` maps it to a (low, high) confidence interval at level
+    `confidence`. Batches are drawn a round at a time, one per worker,
+    until every interval is within `error` of its estimate or
+    MAX_BATCHES were drawn.
+    """
+    link_graph = LinkGraph.from_corpus(corpus)
+    workers = workers or os.cpu_count() or 1
+    seeds = np.random.SeedSequence(seed)
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+
+    estimates = []
+    with multiprocessing.Pool(
+        workers, initializer=start_worker, initargs=(link_graph,)
+    ) as pool:
+        while len(estimates) < MAX_BATCHES:
+            tasks = [
+                (damping_factor, child) for child in seeds.spawn(workers)
+            ]
+            estimates.extend(pool.map(run_batch, tasks))
+            if len(estimates) < MIN_BATCHES:
+                continue
+            mean, half_width = batch_interval(estimates, z)
+            if half_width.max() <= error:
+                break
+
+    mean, half_width = batch_interval(estimates, z)
+    ranks = link_graph.to_dict(mean)
+    intervals = {
+        page: (float(mean[i] - half_width[i]), float(mean[i] + half_width[i]))
+        for i, page in enumerate(link_graph.pages)
+    }
+    return ranks, intervals
+
+
+def batch_interval(estimates, z):
+    """
+    Return the mean of the batch estimates and the half width of each
+    page's normal confidence interval, z standard errors wide.
+    """
+    estimates = np.array(estimates)
+    mean = estimates.mean(axis=0)
+    if len(estimates) < 2:
+        return mean, np.full(len(mean), np.inf)
+    standard_error = estimates.std(axis=0, ddof=1) / np.sqrt(len(estimates))
+    return mean, z * standard_error
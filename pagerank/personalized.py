@@ -0,0 +1,105 @@
+from collections import deque
+
+import numpy as np
+
+from graph import LinkGraph, power_iteration
+
+TOLERANCE = 1e-6
+
+# Residual per link below which forward push leaves a page alone
+EPSILON = 1e-4
+
+
+def personalized_pagerank(corpus, damping_factor, personalizations,
+                          tolerance=TOLERANCE):
+    """
+    Return a list with one PageRank dict per personalization.
+
+    Each personalization says where the surfer jumps instead of to a
+    uniformly random page: either a dict mapping pages to teleport
+    weights, or a collection of pages (a topic) jumped to uniformly.
+    All of them share one graph and one N x k teleport matrix, solved
+    by `power_iteration` column by column.
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    teleport = teleport_matrix(graph, personalizations)
+    ranks = power_iteration(graph, damping_factor, tolerance,
+                            teleport=teleport)
+    return [graph.to_dict(column) for column in ranks.T]
+
+
+def teleport_matrix(graph, personalizations):
+    """
+    Return an N x k matrix whose columns are the teleport distributions
+    of k personalizations, each normalized to sum to 1.
+    """
+    teleport = np.zeros((len(graph), len(personalizations)))
+    for column, personalization in enumerate(personalizations):
+        if not isinstance(personalization, dict):
+            personalization = dict.fromkeys(personalization, 1)
+        for page, weight in personalization.items():
+            if page not in graph.index:
+                raise ValueError(f"{page} is not in the corpus")
+            if weight < 0:
+                raise ValueError(f"{page} has a negative teleport weight")
+            teleport[graph.index[page], column] = weight
+        total = teleport[:, column].sum()
+        if total <= 0:
+            raise ValueError(
+                f"personalization {column} has no positive teleport weight"
+            )
+        teleport[:, column] /= total
+    return teleport
+
+
+def single_source_pagerank(graph, source, damping_factor, epsilon=EPSILON,
+                           global_ranks=None):
+    """
+    Return an approximate {page: rank} dict of the PageRank personalized
+    to always jump back to `source`, by forward push.
+
+    Every page starts with zero rank and zero residual, except for a
+    residual of 1 on `source`. A page whose residual exceeds `epsilon`
+    times its number of links keeps (1 - d) of it as rank and pushes the
+    rest to the pages it links to, so only pages near `source` are ever
+    touched and the cost does not grow with the size of the corpus.
+    The residual left on each page is at most `epsilon` per link.
+
+    A page without links pushes to every page. That share is kept as a
+    single uniform residual instead, whose ranks are a multiple of the
+    ordinary PageRank vector. If `global_ranks` (as from
+    `power_iteration`) is given, it is added in and every page is
+    returned; otherwise it is left out and only touched pages returned.
+    """
+    start = graph.index[source]
+    ranks = {}
+    residuals = {start: 1.0}
+    uniform = 0.0
+    queue = deque([start])
+
+    while queue:
+        page = queue.popleft()
+        residual = residuals.pop(page)
+        ranks[page] = ranks.get(page, 0) + (1 - damping_factor) * residual
+
+        degree = int(graph.out_degree[page])
+        if degree == 0:
+            uniform += damping_factor * residual
+            continue
+        share = damping_factor * residual / degree
+        first, last = graph.out_offsets[page], graph.out_offsets[page + 1]
+        for link in graph.out_targets[first:last].tolist():
+            before = residuals.get(link, 0)
+            residuals[link] = before + share
+
+            # Queue a page once, when its residual crosses the threshold
+            threshold = epsilon * max(int(graph.out_degree[link]), 1)
+            if before <= threshold < before + share:
+                queue.append(link)
+
+    if global_ranks is None:
+        return {graph.pages[page]: rank for page, rank in ranks.items()}
+    result = uniform * np.asarray(global_ranks, dtype=float)
+    for page, rank in ranks.items():
+        result[page] += rank
+    return graph.to_dict(result)
@@ -0,0 +1,240 @@
+import argparse
+import time
+
+import numpy as np
+
+from crawler import crawl_edges, list_pages
+from graph import LinkGraph
+
+DAMPING = 0.85
+TOLERANCE = 1e-6
+MAX_ITERATIONS = 1000
+
+# Pages updated together by one Gauss-Seidel step; 1 is classic
+# Gauss-Seidel, larger blocks trade convergence for vectorization
+BLOCK_SIZE = 1024
+
+# Jacobi sweeps between two extrapolations
+EXTRAPOLATE_EVERY = 10
+
+
+class Solution():
+    """
+    Rank vector found by a solver, with a record of how it got there:
+    the L1 change made by every sweep and the time each sweep took.
+    """
+
+    def __init__(self, method, ranks, residuals, sweep_seconds, tolerance):
+        self.method = method
+        self.ranks = ranks
+        self.residuals = residuals
+        self.sweep_seconds = sweep_seconds
+        self.converged = bool(residuals and residuals[-1] < tolerance)
+
+    @property
+    def iterations(self):
+        return len(self.residuals)
+
+    @property
+    def seconds(self):
+        return sum(self.sweep_seconds)
+
+
+def solve(graph, damping_factor, tolerance=TOLERANCE, method="jacobi",
+          max_iterations=MAX_ITERATIONS):
+    """
+    Return the Solution of PageRank on a graph by one of METHODS,
+    sweeping until the L1 change of a sweep is below `tolerance` or
+    `max_iterations` sweeps were made. The ranks are scaled to sum to 1.
+    """
+    if method not in METHODS:
+        raise ValueError(
+            f"unknown method {method}, expected one of {', '.join(METHODS)}"
+        )
+    sweeps = METHODS[method](graph, damping_factor)
+
+    residuals, sweep_seconds = [], []
+    ranks = None
+    for _ in range(max_iterations):
+        start = time.perf_counter()
+        ranks, change = next(sweeps)
+        sweep_seconds.append(time.perf_counter() - start)
+        residuals.append(change)
+        if change < tolerance:
+            break
+    return Solution(
+        method, ranks / ranks.sum(), residuals, sweep_seconds, tolerance
+    )
+
+
+def jacobi(graph, damping_factor):
+    """
+    Yield (ranks, change) after every power iteration step, each page
+    updated from the previous iterate only.
+    """
+    ranks = np.full(len(graph), 1 / len(graph))
+    while True:
+        new_ranks = graph.step(ranks, damping_factor)
+        change = np.abs(new_ranks - ranks).sum()
+        ranks = new_ranks
+        yield ranks, change
+
+
+def gauss_seidel(graph, damping_factor, block_size=BLOCK_SIZE):
+    """
+    Yield (ranks, change) after every block Gauss-Seidel sweep.
+
+    Pages are updated in place, a block of `block_size` pages at a time,
+    so each block already sees the new ranks of the blocks before it.
+    Within a block the update is one vectorized bincount over the links
+    into those pages, which are grouped by target page once up front.
+    Jumps carry the current total rank rather than a constant, so this
+    iterates towards the same eigenvector as Jacobi, and the ranks are
+    scaled back to sum to 1 after every sweep.
+    """
+    size = len(graph)
+    order = np.argsort(graph.targets, kind="stable")
+    in_sources = graph.sources[order]
+    in_targets = graph.targets[order]
+    in_weights = graph.weights[order]
+    in_offsets = np.concatenate(
+        ([0], np.cumsum(np.bincount(graph.targets, minlength=size)))
+    )
+
+    ranks = np.full(size, 1 / size)
+    while True:
+        previous = ranks.copy()
+        mass = 1
+        dangling_mass = ranks[graph.dangling].sum()
+        for low in range(0, size, block_size):
+            high = min(low + block_size, size)
+            links = slice(in_offsets[low], in_offsets[high])
+            received = np.bincount(
+                in_targets[links] - low,
+                weights=ranks[in_sources[links]] * in_weights[links],
+                minlength=high - low
+            )
+            new = (
+                damping_factor * (received + dangling_mass / size)
+                + (1 - damping_factor) * mass / size
+            )
+
+            # Keep the sums the next blocks depend on up to date
+            old = ranks[low:high]
+            dangling = graph.dangling[low:high]
+            dangling_mass += new[dangling].sum() - old[dangling].sum()
+            mass += new.sum() - old.sum()
+            ranks[low:high] = new
+
+        ranks /= mass
+        yield ranks, np.abs(ranks - previous).sum()
+
+
+def aitken(graph, damping_factor, every=EXTRAPOLATE_EVERY):
+    """
+    Yield (ranks, change) after every Jacobi step, replacing every
+    `every`th iterate by the Aitken delta-squared extrapolation of the
+    last three iterates.
+    """
+    return extrapolated(graph, damping_factor, aitken_step, 3, every)
+
+
+def quadratic(graph, damping_factor, every=EXTRAPOLATE_EVERY):
+    """
+    Yield (ranks, change) after every Jacobi step, replacing every
+    `every`th iterate by the quadratic extrapolation of the last four
+    iterates (Kamvar et al., "Extrapolation Methods for Accelerating
+    PageRank Computations").
+    """
+    return extrapolated(graph, damping_factor, quadratic_step, 4, every)
+
+
+def extrapolated(graph, damping_factor, extrapolate, depth, every):
+    """
+    Yield (ranks, change) after every Jacobi step, replacing every
+    `every`th iterate by `extrapolate` of the last `depth` iterates.
+    The change of such a step includes the extrapolation, so a sweep
+    only counts as converged if extrapolating barely moved the ranks.
+    """
+    ranks = np.full(len(graph), 1 / len(graph))
+    history = [ranks]
+    sweeps = 0
+    while True:
+        new_ranks = graph.step(ranks, damping_factor)
+        sweeps += 1
+        history.append(new_ranks)
+        del history[:-depth]
+        if sweeps % every == 0 and len(history) == depth:
+            new_ranks = extrapolate(*history)
+            new_ranks /= new_ranks.sum()
+            history = [new_ranks]
+        change = np.abs(new_ranks - ranks).sum()
+        ranks = new_ranks
+        yield ranks, change
+
+
+def aitken_step(first, second, third):
+    """
+    Return the page-by-page Aitken extrapolation of three iterates.
+    Pages where it is undefined or not positive keep the last iterate.
+    """
+    curvature = third - 2 * second + first
+    with np.errstate(divide="ignore", invalid="ignore"):
+        estimate = first - (second - first) ** 2 / curvature
+    usable = (curvature != 0) & (estimate > 0)
+    return np.where(usable, estimate, third)
+
+
+def quadratic_step(first, second, third, fourth):
+    """
+    Return the quadratic extrapolation of four iterates, which assumes
+    the error lies in the span of the second and third eigenvectors.
+    """
+    differences = np.stack([second - first, third - first], axis=1)
+    gammas, *_ = np.linalg.lstsq(differences, -(fourth - first), rcond=None)
+    gamma_1, gamma_2 = gammas
+    estimate = (
+        (gamma_1 + gamma_2 + 1) * second + (gamma_2 + 1) * third + fourth
+    )
+    if np.any(estimate <= 0):
+        return fourth
+    return estimate
+
+
+METHODS = {
+    "jacobi": jacobi,
+    "gauss-seidel": gauss_seidel,
+    "aitken": aitken,
+    "quadratic": quadratic,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare PageRank solvers on a corpus"
+    )
+    parser.add_argument("corpus", help="directory of HTML pages")
+    parser.add_argument("--damping", type=float, default=DAMPING)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument(
+        "--methods", nargs="+", choices=list(METHODS), default=list(METHODS)
+    )
+    args = parser.parse_args()
+
+    graph = LinkGraph.from_edges(
+        list_pages(args.corpus), crawl_edges(args.corpus)
+    )
+    reference = solve(graph, args.damping, args.tolerance / 1000).ranks
+    print(f"{'method':<14}{'sweeps':>8}{'seconds':>10}"
+          f"{'per sweep':>12}{'residual':>11}{'L1 error':>11}")
+    for method in args.methods:
+        solution = solve(graph, args.damping, args.tolerance, method)
+        error = np.abs(solution.ranks - reference).sum()
+        print(f"{method:<14}{solution.iterations:>8}"
+              f"{solution.seconds:>10.4f}"
+              f"{solution.seconds / solution.iterations:>12.6f}"
+              f"{solution.residuals[-1]:>11.2e}{error:>11.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+Tests for pagerank.py and the modules around it, checked against
+PageRank found by a dense linear solve.
+"""
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+import cache
+import solvers
+
+from graph import LinkGraph, power_iteration
+from incremental import update_pagerank
+from pagerank import crawl, iterate_pagerank, sample_pagerank
+from parallel import parallel_sample_pagerank
+from personalized import (
+    personalized_pagerank, single_source_pagerank, teleport_matrix
+)
+
+DAMPING = 0.85
+
+CORPORA = ["corpus0", "corpus1", "corpus2"]
+
+# Page 3 has no links, so the surfer jumps from it to any page
+TINY = {"1": {"2"}, "2": {"1", "3"}, "3": set()}
+
+
+def load(name):
+    return crawl(os.path.join(os.path.dirname(__file__), name))
+
+
+def dense_pagerank(corpus, damping_factor, teleport=None):
+    """
+    Return {page: rank} solving r = d M r + (1 - d) t exactly, where M
+    follows a uniform link, or jumps anywhere from a page without links.
+    """
+    pages = sorted(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+    size = len(pages)
+    transition = np.zeros((size, size))
+    for page, links in corpus.items():
+        if links:
+            for link in links:
+                transition[index[link], index[page]] = 1 / len(links)
+        else:
+            transition[:, index[page]] = 1 / size
+    if teleport is None:
+        teleport = np.full(size, 1 / size)
+    ranks = np.linalg.solve(
+        np.eye(size) - damping_factor * transition,
+        (1 - damping_factor) * np.asarray(teleport)
+    )
+    return dict(zip(pages, ranks))
+
+
+def assert_close(ranks, expected, tolerance):
+    assert ranks.keys() == expected.keys()
+    error = sum(abs(ranks[page] - expected[page]) for page in expected)
+    assert error < tolerance
+
+
+@pytest.mark.parametrize("name", CORPORA)
+def test_iterate_matches_dense_solve(name):
+    corpus = load(name)
+    ranks = iterate_pagerank(corpus, DAMPING, 1e-12)
+    assert_close(ranks, dense_pagerank(corpus, DAMPING), 1e-9)
+
+
+def test_dangling_page():
+    ranks = iterate_pagerank(TINY, DAMPING, 1e-12)
+    assert_close(ranks, dense_pagerank(TINY, DAMPING), 1e-9)
+    assert sum(ranks.values()) == pytest.approx(1)
+
+
+@pytest.mark.parametrize("method", list(solvers.METHODS))
+@pytest.mark.parametrize("name", CORPORA + ["tiny"])
+def test_solvers_match_dense_solve(name, method):
+    corpus = TINY if name == "tiny" else load(name)
+    ranks = iterate_pagerank(corpus, DAMPING, 1e-12, method)
+    assert_close(ranks, dense_pagerank(corpus, DAMPING), 1e-9)
+
+
+def test_gauss_seidel_blocks():
+    corpus = load("corpus2")
+    graph = LinkGraph.from_corpus(corpus)
+    sweeps = solvers.gauss_seidel(graph, DAMPING, block_size=2)
+    for ranks, change in sweeps:
+        if change < 1e-12:
+            break
+    ranks = graph.to_dict(ranks / ranks.sum())
+    assert_close(ranks, dense_pagerank(corpus, DAMPING), 1e-9)
+
+
+def test_solution_records_sweeps():
+    graph = LinkGraph.from_corpus(load("corpus1"))
+    solution = solvers.solve(graph, DAMPING, 1e-8, "gauss-seidel")
+    assert solution.converged
+    assert solution.iterations == len(solution.sweep_seconds)
+    assert solution.residuals[-1] < 1e-8
+
+    capped = solvers.solve(graph, DAMPING, 1e-8, max_iterations=3)
+    assert capped.iterations == 3 and not capped.converged
+    with pytest.raises(ValueError):
+        solvers.solve(graph, DAMPING, method="newton")
+
+
+@pytest.mark.parametrize("walkers", [1, 100])
+@pytest.mark.parametrize("name", CORPORA + ["tiny"])
+def test_sampling_is_close(name, walkers):
+    corpus = TINY if name == "tiny" else load(name)
+    ranks = sample_pagerank(corpus, DAMPING, 200000, seed=0, walkers=walkers)
+    assert_close(ranks, dense_pagerank(corpus, DAMPING), 0.03)
+
+
+@pytest.mark.parametrize("walkers", [1, 10])
+def test_sampling_is_seeded(walkers):
+    corpus = load("corpus0")
+    first = sample_pagerank(corpus, DAMPING, 1000, seed=1, walkers=walkers)
+    again = sample_pagerank(corpus, DAMPING, 1000, seed=1, walkers=walkers)
+    assert first == again
+    assert sum(first.values()) == pytest.approx(1)
+
+
+def test_parallel_sampling_interval():
+    corpus = load("corpus1")
+    ranks, intervals = parallel_sample_pagerank(
+        corpus, DAMPING, error=0.01, workers=2, seed=0
+    )
+    assert_close(ranks, dense_pagerank(corpus, DAMPING), 0.02)
+    for page, (low, high) in intervals.items():
+        assert low <= ranks[page] <= high
+        assert high - low <= 0.02 + 1e-12
+
+
+def test_parallel_sampling_is_seeded():
+    corpus = load("corpus0")
+    first = parallel_sample_pagerank(corpus, DAMPING, 0.01, workers=2, seed=1)
+    again = parallel_sample_pagerank(corpus, DAMPING, 0.01, workers=2, seed=1)
+    assert first == again
+
+
+def links_of(graph):
+    """Return the corpus dict of a graph."""
+    offsets, targets = graph.out_offsets, graph.out_targets
+    return {
+        page: {graph.pages[link] for link in targets[start:end]}
+        for page, start, end in zip(graph.pages, offsets, offsets[1:])
+    }
+
+
+def check_update(corpus, expected, **changes):
+    graph = LinkGraph.from_corpus(corpus)
+    ranks = power_iteration(graph, DAMPING, 1e-12)
+    new_graph, new_ranks = update_pagerank(
+        graph, ranks, DAMPING, 1e-12, **changes
+    )
+    assert links_of(new_graph) == expected
+    assert_close(
+        new_graph.to_dict(new_ranks),
+        iterate_pagerank(expected, DAMPING, 1e-12), 1e-9
+    )
+
+
+@pytest.mark.parametrize("name", CORPORA + ["tiny"])
+def test_update_adds_page_and_links(name):
+    corpus = TINY if name == "tiny" else load(name)
+    first, second, last = sorted(corpus)[:2] + sorted(corpus)[-1:]
+    removed = sorted(corpus[second])[:1]
+    expected = {page: set(links) for page, links in corpus.items()}
+    expected["new.html"] = {first}
+    expected[last].add("new.html")
+    expected[second].difference_update(removed)
+    check_update(
+        corpus, expected, added_pages=["new.html"],
+        added_links=[("new.html", first), (last, "new.html")],
+        removed_links=[(second, link) for link in removed]
+    )
+
+
+@pytest.mark.parametrize("name", CORPORA + ["tiny"])
+def test_update_removes_page(name):
+    corpus = TINY if name == "tiny" else load(name)
+    # The page with the most links to it
+    linked = [link for links in corpus.values() for link in links]
+    gone = max(sorted(corpus), key=linked.count)
+    expected = {
+        page: links - {gone} for page, links in corpus.items() if page != gone
+    }
+    check_update(corpus, expected, removed_pages=[gone])
+
+
+@pytest.mark.parametrize("name", CORPORA)
+def test_update_leaves_page_without_links(name):
+    corpus = load(name)
+    page = sorted(corpus)[0]
+    expected = dict(corpus)
+    expected[page] = set()
+    check_update(
+        corpus, expected, removed_links=[(page, link) for link in corpus[page]]
+    )
+
+
+def test_update_chain():
+    corpus = load("corpus2")
+    graph = LinkGraph.from_corpus(corpus)
+    ranks = power_iteration(graph, DAMPING, 1e-12)
+    pages = sorted(corpus)
+    for page, link in zip(pages, reversed(pages)):
+        graph, ranks = update_pagerank(
+            graph, ranks, DAMPING, 1e-12, added_links=[(page, link)]
+        )
+        if page != link:
+            corpus = dict(corpus)
+            corpus[page] = corpus[page] | {link}
+    assert links_of(graph) == corpus
+    assert_close(graph.to_dict(ranks), dense_pagerank(corpus, DAMPING), 1e-9)
+
+
+def copy_corpus(name, directory):
+    source = os.path.join(os.path.dirname(__file__), name)
+    for page in os.listdir(source):
+        shutil.copy(os.path.join(source, page), directory)
+    return str(directory)
+
+
+def test_cache_reuses_graph_and_ranks(tmp_path):
+    directory = copy_corpus("corpus1", tmp_path)
+    graph, key = cache.load_graph(directory)
+    assert links_of(graph) == crawl(directory)
+    ranks = cache.load_ranks(directory, key, "ranks", lambda: np.ones(3))
+
+    cached, cached_key = cache.load_graph(directory)
+    assert cached_key == key
+    assert links_of(cached) == links_of(graph)
+    assert np.array_equal(
+        cache.load_ranks(directory, key, "ranks", pytest.fail), ranks
+    )
+
+
+@pytest.mark.parametrize("contents", [b"", b"PK\x03\x04", b"not a zip file"])
+def test_cache_ignores_unreadable_files(tmp_path, contents):
+    directory = copy_corpus("corpus0", tmp_path)
+    graph, key = cache.load_graph(directory)
+    cache.load_ranks(directory, key, "ranks", lambda: np.ones(4))
+    for kind in ["graph", "ranks"]:
+        path = os.path.join(directory, cache.DIRECTORY, f"{key}.{kind}.npz")
+        with open(path, "wb") as f:
+            f.write(contents)
+
+    reloaded, _ = cache.load_graph(directory)
+    assert links_of(reloaded) == links_of(graph)
+    ranks = cache.load_ranks(directory, key, "ranks", lambda: np.zeros(4))
+    assert np.array_equal(ranks, np.zeros(4))
+
+
+def test_cache_forgets_old_contents(tmp_path):
+    directory = copy_corpus("corpus0", tmp_path)
+    page = os.path.join(directory, "1.html")
+    keys = []
+    for i in range(cache.MAX_KEYS + 2):
+        with open(page, "a") as f:
+            f.write(f"<!-- edit {i} -->\n")
+        keys.append(cache.load_graph(directory)[1])
+
+    files = os.listdir(os.path.join(directory, cache.DIRECTORY))
+    assert f"{keys[0]}.graph.npz" not in files
+    assert f"{keys[-1]}.graph.npz" in files
+    graphs = [name for name in files if name.endswith(".graph.npz")]
+    assert len(graphs) <= cache.MAX_KEYS
+
+
+@pytest.mark.parametrize("name", CORPORA)
+def test_personalized_matches_dense_solve(name):
+    corpus = load(name)
+    pages = sorted(corpus)
+    weights = {pages[0]: 3, pages[-1]: 1}
+    topic = pages[:2]
+    ranks = personalized_pagerank(
+        corpus, DAMPING, [weights, topic], tolerance=1e-12
+    )
+    for personalization, result in zip([weights, topic], ranks):
+        if not isinstance(personalization, dict):
+            personalization = dict.fromkeys(personalization, 1)
+        total = sum(personalization.values())
+        teleport = [personalization.get(page, 0) / total for page in pages]
+        expected = dense_pagerank(corpus, DAMPING, teleport)
+        assert_close(result, expected, 1e-9)
+
+
+def test_personalized_rejects_unknown_page():
+    graph = LinkGraph.from_corpus(TINY)
+    with pytest.raises(ValueError):
+        teleport_matrix(graph, [{"4": 1}])
+    with pytest.raises(ValueError):
+        teleport_matrix(graph, [{"1": 0}])
+
+
+@pytest.mark.parametrize("name", CORPORA + ["tiny"])
+def test_single_source_push(name):
+    corpus = TINY if name == "tiny" else load(name)
+    graph = LinkGraph.from_corpus(corpus)
+    source = graph.pages[0]
+    global_ranks = list(dense_pagerank(corpus, DAMPING).values())
+    ranks = single_source_pagerank(
+        graph, source, DAMPING, epsilon=1e-8, global_ranks=global_ranks
+    )
+    teleport = [page == source for page in graph.pages]
+    assert_close(ranks, dense_pagerank(corpus, DAMPING, teleport), 1e-5)
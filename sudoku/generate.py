@@ -2,7 +2,6 @@ import argparse
 import sys
 import time
 
-from copy import deepcopy
 from PIL import Image, ImageDraw, ImageFont
 from sudoku import Sudoku
 
@@ -81,6 +80,11 @@ class SudokuSolver():
         }
         self.show_log = show_log
         self.show_init = show_init
+
+        # (cell, domain) pairs of domains replaced since the search
+        # began, so backtracking can restore them without a full copy
+        self.trail = []
+
         self.backtrack_counter = 0
         self.numbers_tested = 0
 
@@ -198,14 +202,32 @@ class SudokuSolver():
         if y not in self.sudoku.neighbors(x):
             return False
 
-        for x_val in self.domains[x].copy():
-            y_val = list(self.domains[y])[0]
-            if x_val == y_val:
-                revised = True
-                self.domains[x].remove(x_val)
+        y_val = self.domains[y][0]
+        if y_val in self.domains[x]:
+            revised = True
+            self.set_domain(
+                x, [x_val for x_val in self.domains[x] if x_val != y_val]
+            )
 
         return revised
 
+    def set_domain(self, cell, domain):
+        """
+        Replace the domain of `cell`, recording the old one on the trail.
+        Domains are never changed in place, so the recorded list stays
+        as it was.
+        """
+        self.trail.append((cell, self.domains[cell]))
+        self.domains[cell] = domain
+
+    def undo(self, mark):
+        """
+        Restore every domain changed since the trail had `mark` entries.
+        """
+        while len(self.trail) > mark:
+            cell, domain = self.trail.pop()
+            self.domains[cell] = domain
+
     def ac3(self, arcs=None):
         """
         Updates `self.domains` such that each variable is arc consistent.
@@ -312,9 +334,9 @@ class SudokuSolver():
                 print(f"{var} : {value}")
                 print()
                 self.print(assignment)
+            mark = len(self.trail)
             if self.consistent(assignment):
-                prev_domain = deepcopy(self.domains)
-                self.domains[var] = [value]
+                self.set_domain(var, [value])
                 inference = self.inference(var, assignment)
                 if inference is not None:
                     assignment.update(inference)
@@ -327,8 +349,9 @@ class SudokuSolver():
                             del assignment[inference_var]
 
             # Assignment of value is wrong for var, delete assignemnt
+            # and restore the domains pruned since it was made
             del assignment[var]
-            self.domains = prev_domain
+            self.undo(mark)
 
         # Current var has no value in its domain that works
         return None